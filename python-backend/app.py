@@ -1,35 +1,50 @@
-from flask import Flask, request, jsonify
+import time
+
+# Measure cold start from the first import onwards
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from nltk.sentiment import SentimentIntensityAnalyzer
+from werkzeug.exceptions import RequestEntityTooLarge
 import random
 import json
 import os
 import re
 import logging
+import threading
 from datetime import datetime
-import string
 
-# Download NLTK data
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet')
-nltk.download('vader_lexicon')
+import codec
+import intent_classifier
+import metrics
+import nlp_resources
+import pricing
+import text_processing
+from catalog import Catalog, load_catalog
+from catalog_journal import CatalogConflict, create_catalog_journal
+from context_store import create_context_store
+from conversation_log import create_conversation_log
+from entity_index import EntityIndex
+from intent_matcher import IntentMatcher
+from models import UserContext
+from pipeline import Pipeline
+from ttl_cache import TTLCache
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = int(os.environ.get("MAX_REQUEST_BYTES", 2 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize NLP tools
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
-sentiment_analyzer = SentimentIntensityAnalyzer()
+# NLP tools are loaded lazily from local NLTK data; set NLP_PREWARM=1 to load
+# them at import instead, e.g. in a pre-fork parent so workers share them
+if os.environ.get("NLP_PREWARM", "").lower() in ("1", "true", "yes"):
+    nlp_resources.prewarm()
 
 # Load website structure data
 website_structure = {
@@ -170,148 +185,110 @@ intents = {
     }
 }
 
-# User context management
-user_contexts = {}
+# Patterns that mark a question about a website section
+section_inquiry_patterns = ["do you have", "is there", "where is", "how do i find", "can i find"]
+
+# Direct navigation shortcuts
+direct_destinations = {
+    "cart": "cart",
+    "shopping cart": "cart",
+    "my cart": "cart",
+    "home": "home",
+    "homepage": "home",
+    "main page": "home",
+    "categories": "categories",
+    "category page": "categories",
+    "orders": "orders",
+    "my orders": "orders",
+    "order history": "orders",
+    "wishlist": "wishlist",
+    "my wishlist": "wishlist",
+    "saved items": "wishlist"
+}
+
+# Words that point a section inquiry at a specific section
+section_patterns = {
+    "orders": ["order", "purchase history"],
+    "wishlist": ["wishlist", "saved items", "favorites"],
+    "cart": ["cart", "shopping cart"],
+    "categories": ["categories", "product categories"],
+    "account": ["account", "profile", "settings"]
+}
+
+# "rules" for the pattern matcher, "classifier" for the trained model
+INTENT_ENGINE = os.environ.get("INTENT_ENGINE", "rules").lower()
+INTENT_MODEL_PATH = os.environ.get("INTENT_MODEL_PATH") or None
+INTENT_CONFIDENCE = float(os.environ["INTENT_CONFIDENCE"]) if os.environ.get("INTENT_CONFIDENCE") else None
 
-def preprocess_text(text):
-    """Preprocess text by tokenizing, removing stop words, and lemmatizing"""
-    # Remove punctuation
-    text = text.lower().translate(str.maketrans('', '', string.punctuation))
+# Answers to repeated queries, keyed on the normalized query and catalog version
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 10000))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 300))
+response_cache = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL) if RESPONSE_CACHE_SIZE > 0 else None
+
+def reload_matchers():
+    """Recompile the intent matcher and entity index from the current tables"""
+    global intent_matcher, intent_engine, entity_index
     
-    # Tokenize
-    tokens = word_tokenize(text)
+    # Every intent pattern, section alias and category in one matcher
+    intent_matcher = IntentMatcher(intents, website_structure, product_categories, section_inquiry_patterns)
+    entity_index = EntityIndex(intents, website_structure, product_categories, direct_destinations, section_patterns)
     
-    # Remove stop words and lemmatize
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token.isalpha() and token not in stop_words]
+    # The rule matcher also answers whenever the classifier is unsure
+    if INTENT_ENGINE == "classifier":
+        intent_engine = intent_classifier.load_engine(intent_matcher, INTENT_MODEL_PATH, INTENT_CONFIDENCE)
+    else:
+        intent_engine = intent_matcher
     
-    return tokens
+    # Cached answers came from the previous tables
+    if response_cache is not None:
+        response_cache.clear()
+
+reload_matchers()
+
+# Product catalog, loaded and indexed once at startup. Requests read
+# whichever snapshot this names when they start; syncs swap in a new one
+catalog = load_catalog()
+catalog_lock = threading.Lock()
+
+# Syncs shared with every other worker and replayed on restart (off unless
+# CATALOG_JOURNAL_PATH is set), checked for new ones this often
+catalog_journal = create_catalog_journal()
+CATALOG_POLL_SECONDS = float(os.environ.get("CATALOG_POLL_SECONDS", 1.0))
+if catalog_journal is not None:
+    catalog = catalog_journal.catch_up(catalog)
+# Process and time of the last look at the journal
+_catalog_polled = (os.getpid(), time.monotonic())
+
+# User context management, bounded and optionally shared across workers
+user_contexts = create_context_store()
+
+# Append-only record of every answered query, written off the request thread
+# (off unless CONVERSATION_LOG_PATH is set)
+conversation_log = create_conversation_log()
+
+# Intents answered with a random canned response
+STATIC_INTENTS = {"greeting", "goodbye", "thanks", "help", "shipping_info", "return_policy", "payment_methods", "promo_code"}
+
+# Responses to these vary per request (random variants, cart contents), so
+# only their intent and entities are cached and the response is rebuilt
+REBUILT_INTENTS = STATIC_INTENTS | {"order_status", "cart_status"}
 
 def detect_intent(text):
     """Detect the user's intent from the text"""
-    preprocessed_text = preprocess_text(text)
     text_lower = text.lower()
     
-    # Check each intent
-    matched_intents = []
-    
-    for intent_name, intent_data in intents.items():
-        for pattern in intent_data.get("patterns", []):
-            if pattern in text_lower:
-                matched_intents.append((intent_name, text_lower.find(pattern)))
-    
-    # Sort by position of match (earlier matches take precedence)
-    if matched_intents:
-        matched_intents.sort(key=lambda x: x[1])
-        return matched_intents[0][0]
-    
-    # Check for section inquiry patterns
-    section_inquiry_patterns = ["do you have", "is there", "where is", "how do i find", "can i find"]
-    for pattern in section_inquiry_patterns:
-        if pattern in text_lower:
-            for section in website_structure.keys():
-                if section in text_lower or any(alias in text_lower for alias in website_structure[section]["aliases"]):
-                    return "section_inquiry"
-    
-    # Check for product category mentions
-    for category in product_categories:
-        if category in text_lower:
-            return "find_product"
-    
-    # Default to unknown intent
-    return "unknown"
+    return intent_engine.detect(text_lower)
 
 def extract_entities(text, intent):
     """Extract relevant entities based on the intent"""
-    # Clean the text by removing trailing punctuation
-    text_lower = text.lower().rstrip('.,!?;:')
-    
-    if intent == "find_product":
-        # Extract product name or category
-        for pattern in intents[intent]["patterns"]:
-            if pattern in text_lower:
-                entity = text_lower.split(pattern)[1].strip()
-                return {"product_query": entity}
-        
-        # Check for direct category mentions
-        for category in product_categories:
-            if category in text_lower:
-                return {"product_query": category}
-    
-    elif intent == "add_to_cart":
-        # Extract product name
-        for pattern in intents[intent]["patterns"]:
-            if pattern in text_lower:
-                entity = text_lower.split(pattern)[1].strip()
-                return {"product_name": entity}
-        
-        # Handle simple "add" command
-        if "add" in text_lower and not any(p in text_lower for p in intents[intent]["patterns"]):
-            entity = text_lower.split("add")[1].strip()
-            return {"product_name": entity}
-    
-    elif intent == "navigation":
-        # Extract destination
-        for pattern in intents[intent]["patterns"]:
-            if pattern in text_lower:
-                entity = text_lower.split(pattern)[1].strip()
-                return {"destination": entity}
-        
-        # Direct navigation shortcuts
-        direct_destinations = {
-            "cart": "cart",
-            "shopping cart": "cart",
-            "my cart": "cart",
-            "home": "home",
-            "homepage": "home",
-            "main page": "home",
-            "categories": "categories",
-            "category page": "categories",
-            "orders": "orders",
-            "my orders": "orders",
-            "order history": "orders",
-            "wishlist": "wishlist",
-            "my wishlist": "wishlist",
-            "saved items": "wishlist"
-        }
-        
-        for key, value in direct_destinations.items():
-            if key in text_lower:
-                return {"destination": value}
-    
-    elif intent == "product_info":
-        # Extract product name
-        for pattern in intents[intent]["patterns"]:
-            if pattern in text_lower:
-                entity = text_lower.split(pattern)[1].strip()
-                return {"product_name": entity}
-    
-    elif intent == "section_inquiry":
-        # Extract section name
-        for section, data in website_structure.items():
-            if section in text_lower:
-                return {"section": section}
-            for alias in data["aliases"]:
-                if alias in text_lower:
-                    return {"section": section}
-        
-        # Check for specific section inquiries
-        section_patterns = {
-            "orders": ["order", "purchase history"],
-            "wishlist": ["wishlist", "saved items", "favorites"],
-            "cart": ["cart", "shopping cart"],
-            "categories": ["categories", "product categories"],
-            "account": ["account", "profile", "settings"]
-        }
-        
-        for section, patterns in section_patterns.items():
-            for pattern in patterns:
-                if pattern in text_lower:
-                    return {"section": section}
-    
-    return {}
+    return entity_index.extract(text, intent)
 
 def analyze_sentiment(text):
     """Analyze the sentiment of the text"""
+    sentiment_analyzer = nlp_resources.get_sentiment_analyzer()
+    if sentiment_analyzer is None:
+        return "neutral"
+    
     sentiment_scores = sentiment_analyzer.polarity_scores(text)
     
     if sentiment_scores['compound'] >= 0.05:
@@ -321,26 +298,44 @@ def analyze_sentiment(text):
     else:
         return "neutral"
 
-def get_response(intent, entities, user_id, products=None, cart=None):
+def load_user_context(user_id):
+    """Return the stored context for a user, or a fresh one"""
+    return user_contexts.get(user_id) or UserContext()
+
+# Per-user history of recent turns, stored with every context when on. The
+# conversation log already keeps the full record, so entries here are only
+# the intent and response type
+CONTEXT_HISTORY = os.environ.get("CONTEXT_HISTORY", "").lower() in ("1", "true", "yes")
+
+def remember_turn(user_context, intent, response):
+    """Add how a query was answered to the user's history when CONTEXT_HISTORY is on"""
+    if CONTEXT_HISTORY:
+        user_context.remember([intent, response.get('type')])
+
+def get_response(intent, entities, user_id, catalog=None, cart=None, sentiment=None):
     """Generate a response based on the intent and entities"""
     # Get user context
-    user_context = user_contexts.get(user_id, {
-        "last_products_shown": [],
-        "last_intent": None,
-        "conversation_history": [],
-        "sentiment": "neutral"
-    })
+    user_context = load_user_context(user_id)
     
-    # Analyze sentiment
-    sentiment = analyze_sentiment(intent)
-    user_context["sentiment"] = sentiment
+    # Sentiment of the user's query, when sentiment analysis is enabled
+    if sentiment is not None:
+        user_context.sentiment = sentiment
     
     # Update user context
-    user_context["last_intent"] = intent
-    user_contexts[user_id] = user_context
+    user_context.last_intent = intent
+    
+    response = build_response(intent, entities, user_context, catalog, cart)
+    remember_turn(user_context, intent, response)
     
+    # Save once the response has finished updating the context
+    user_contexts.set(user_id, user_context)
+    
+    return response
+
+def build_response(intent, entities, user_context, catalog=None, cart=None):
+    """Build the response for an intent, updating user_context in place"""
     # Handle intents that don't require context
-    if intent in ["greeting", "goodbye", "thanks", "help", "shipping_info", "return_policy", "payment_methods", "promo_code"]:
+    if intent in STATIC_INTENTS:
         return {
             "message": random.choice(intents[intent]["responses"]),
             "type": intent
@@ -352,20 +347,17 @@ def get_response(intent, entities, user_id, products=None, cart=None):
         
         # In a real implementation, this would search your product database
         # For now, we'll simulate finding products
-        if products:
-            matching_products = [p for p in products if 
-                                query.lower() in p["name"].lower() or 
-                                query.lower() in p["category"].lower() or
-                                query.lower() in p["description"].lower()]
+        if catalog:
+            total, matching_products = catalog.search(query, limit=3)
             
             if matching_products:
                 # Update context with found products
-                user_context["last_products_shown"] = matching_products[:3]
+                user_context.last_product_ids = [p.id for p in matching_products]
                 
                 return {
-                    "message": f"I found {len(matching_products)} products matching '{query}'. Here are some options:",
+                    "message": f"I found {total} products matching '{query}'. Here are some options:",
                     "type": "product_results",
-                    "products": matching_products[:3],
+                    "products": matching_products,
                     "action": f"search:{query}"
                 }
             else:
@@ -384,15 +376,15 @@ def get_response(intent, entities, user_id, products=None, cart=None):
         product_name = entities["product_name"]
         
         # Check if we have products to search through
-        if products:
-            matching_product = next((p for p in products if product_name.lower() in p["name"].lower()), None)
+        if catalog:
+            matching_product = catalog.best_match(product_name)
             
             if matching_product:
                 return {
-                    "message": f"I've added {matching_product['name']} to your cart.",
+                    "message": f"I've added {matching_product.name} to your cart.",
                     "type": "add_to_cart_success",
                     "product": matching_product,
-                    "action": f"addToCart:{matching_product['id']}"
+                    "action": f"addToCart:{matching_product.id}"
                 }
             else:
                 return {
@@ -411,31 +403,32 @@ def get_response(intent, entities, user_id, products=None, cart=None):
         destination = entities["destination"]
         
         # Check if destination matches any website section
-        for section_name, section_data in website_structure.items():
-            if destination.lower() == section_name.lower() or destination.lower() in [alias.lower() for alias in section_data["aliases"]]:
-                return {
-                    "message": f"Taking you to the {section_name} section. {section_data['description']}",
-                    "type": "navigation",
-                    "action": f"navigate:{section_data['path']}"
-                }
+        section_name = entity_index.resolve_section(destination)
+        if section_name:
+            section_data = website_structure[section_name]
+            return {
+                "message": f"Taking you to the {section_name} section. {section_data['description']}",
+                "type": "navigation",
+                "action": f"navigate:{section_data['path']}"
+            }
         
         # Check if it's a product category
-        for category in product_categories:
-            if category.lower() in destination.lower():
-                return {
-                    "message": f"Showing you our {category} collection.",
-                    "type": "category_navigation",
-                    "action": f"category:{category}"
-                }
+        category = entity_index.find_category(destination)
+        if category:
+            return {
+                "message": f"Showing you our {category} collection.",
+                "type": "category_navigation",
+                "action": f"category:{category}"
+            }
         
         # Check if it might be a product
-        if products:
-            matching_product = next((p for p in products if destination.lower() in p["name"].lower()), None)
+        if catalog:
+            matching_product = catalog.best_match(destination)
             if matching_product:
                 return {
-                    "message": f"Taking you to the {matching_product['name']} product page.",
+                    "message": f"Taking you to the {matching_product.name} product page.",
                     "type": "product_navigation",
-                    "action": f"navigate:/product/{matching_product['id']}"
+                    "action": f"navigate:/product/{matching_product.id}"
                 }
         
         return {
@@ -445,11 +438,11 @@ def get_response(intent, entities, user_id, products=None, cart=None):
     
     elif intent == "cart_status":
         if cart and len(cart) > 0:
-            total = sum(item["price"] * item["quantity"] for item in cart)
-            item_count = sum(item["quantity"] for item in cart)
+            summary = pricing.summarize_cart(cart)
+            item_count = summary.item_count
             
             return {
-                "message": f"You have {item_count} item{'s' if item_count != 1 else ''} in your cart with a total of ${total:.2f}. Would you like to checkout or continue shopping?",
+                "message": f"You have {item_count} item{'s' if item_count != 1 else ''} in your cart with a total of ${summary.total:.2f}. Would you like to checkout or continue shopping?",
                 "type": "cart_status",
                 "action": "suggestCheckout"
             }
@@ -485,20 +478,21 @@ def get_response(intent, entities, user_id, products=None, cart=None):
     elif intent == "product_info" and "product_name" in entities:
         product_name = entities["product_name"]
         
-        if products:
-            matching_product = next((p for p in products if product_name.lower() in p["name"].lower()), None)
+        if catalog:
+            matching_product = catalog.best_match(product_name)
             
             if matching_product:
-                price_info = f"${matching_product['price']:.2f}"
-                if matching_product.get('discount'):
-                    discounted_price = matching_product['price'] * (1 - matching_product['discount'] / 100)
-                    price_info = f"${discounted_price:.2f} (${matching_product['price']:.2f} - {matching_product['discount']}% off)"
+                price_info = f"${matching_product.price:.2f}"
+                if matching_product.discount:
+                    discounted_price = pricing.discounted_price(matching_product.price, matching_product.discount)
+                    price_info = f"${discounted_price:.2f} (${matching_product.price:.2f} - {matching_product.discount}% off)"
+                rating = matching_product.rating if matching_product.rating is not None else 'N/A'
                 
                 return {
-                    "message": f"{matching_product['name']}: {matching_product['description']} It costs {price_info} and has a rating of {matching_product.get('rating', 'N/A')} out of 5 stars. Would you like to see more details or add it to your cart?",
+                    "message": f"{matching_product.name}: {matching_product.description} It costs {price_info} and has a rating of {rating} out of 5 stars. Would you like to see more details or add it to your cart?",
                     "type": "product_info",
                     "product": matching_product,
-                    "action": f"showProduct:{matching_product['id']}"
+                    "action": f"showProduct:{matching_product.id}"
                 }
             else:
                 return {
@@ -518,41 +512,573 @@ def get_response(intent, entities, user_id, products=None, cart=None):
         "type": "unknown"
     }
 
+# Largest number of queries accepted by one batch request
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 100))
+
+def refresh_catalog():
+    """Apply the syncs other workers journaled since this one last looked"""
+    global catalog, _catalog_polled
+    
+    _catalog_polled = (os.getpid(), time.monotonic())
+    # A thread already syncing or catching up will leave the catalog current
+    if catalog_journal is None or not catalog_lock.acquire(blocking=False):
+        return catalog
+    try:
+        catalog = catalog_journal.catch_up(catalog)
+    except Exception as e:
+        logger.error(f"Could not read the catalog journal: {e}")
+    finally:
+        catalog_lock.release()
+    return catalog
+
+def current_catalog():
+    """Return the server catalog, caught up with the journal at most CATALOG_POLL_SECONDS ago"""
+    if catalog_journal is not None:
+        pid, polled = _catalog_polled
+        # A newly forked worker looks at once, whatever its parent last saw
+        if pid != os.getpid() or time.monotonic() - polled >= CATALOG_POLL_SECONDS:
+            return refresh_catalog()
+    return catalog
+
+def resolve_catalog(products):
+    """Use the product list a request posted, or the server catalog if it sent none"""
+    # Older clients still post the product list with every request
+    return Catalog(products) if products else current_catalog()
+
+# Sentiment is stored in the user context only; VADER runs when this is on
+SENTIMENT_ENABLED = os.environ.get("SENTIMENT_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Intents whose responses use extracted entities
+ENTITY_INTENTS = {"find_product", "add_to_cart", "navigation", "product_info", "section_inquiry"}
+
+# Request pipeline: each stage runs only when a later stage asks for it
+assistant_pipeline = Pipeline()
+
+@assistant_pipeline.stage("normalized")
+def normalize_stage(run):
+    return run["query"].lower()
+
+@assistant_pipeline.stage("intent")
+def intent_stage(run):
+    return intent_engine.detect(run["normalized"])
+
+@assistant_pipeline.stage("entities")
+def entities_stage(run):
+    if run["intent"] not in ENTITY_INTENTS:
+        return {}
+    return extract_entities(run["query"], run["intent"])
+
+@assistant_pipeline.stage("sentiment")
+def sentiment_stage(run):
+    return analyze_sentiment(run["query"])
+
+@assistant_pipeline.stage("response")
+def response_stage(run):
+    return get_response(
+        run["intent"],
+        run["entities"],
+        run["user_id"],
+        run["catalog"],
+        run["cart"],
+        sentiment=run["sentiment"] if SENTIMENT_ENABLED else None
+    )
+
+# Share of requests whose stage latencies are recorded; counters see every request
+METRICS_SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", 0.1))
+
+metrics_registry = metrics.Registry()
+requests_counter = metrics_registry.counter(
+    "assistant_requests_total", "Requests handled, by endpoint and status", ("endpoint", "status"))
+intents_counter = metrics_registry.counter(
+    "assistant_intents_total", "Queries by detected intent", ("intent",))
+responses_counter = metrics_registry.counter(
+    "assistant_responses_total", "Responses by response type", ("type",))
+stage_histogram = metrics_registry.histogram(
+    "assistant_stage_seconds", "Sampled time spent in each request stage", ("stage",))
+metrics_registry.gauge(
+    "assistant_user_contexts", "User contexts currently stored", lambda: user_contexts.stats()["size"])
+metrics_registry.gauge(
+    "assistant_catalog_products", "Products in the server catalog", lambda: len(current_catalog()))
+def cache_sizes():
+    """Return the number of entries in each cache, keyed for the cache gauge"""
+    sizes = {(name,): stats["size"] for name, stats in text_processing.cache_stats().items()}
+    sizes[("response",)] = len(response_cache) if response_cache is not None else 0
+    return sizes
+
+metrics_registry.gauge(
+    "assistant_cache_entries", "Entries held by each cache", cache_sizes, ("cache",))
+
+def should_sample():
+    """Decide whether this request's stage latencies are recorded"""
+    return random.random() < METRICS_SAMPLE_RATE
+
+def record_stage_timings(timings):
+    """Add per-stage millisecond timings to the stage latency histogram"""
+    for key, ms in timings.items():
+        if key != 'total_ms':
+            stage_histogram.observe(ms / 1000, key[:-3])
+
+def respond_from_cache(cached, user_id, request_catalog, cart):
+    """Answer from a cached entry, updating the user context as get_response would"""
+    intent, entities, cached_response = cached
+    
+    user_context = load_user_context(user_id)
+    user_context.last_intent = intent
+    
+    if cached_response is None:
+        # Cheap to rebuild, and keeps response variants random
+        response = build_response(intent, entities, user_context, request_catalog, cart)
+    else:
+        response = dict(cached_response)
+        if response["type"] == "product_results":
+            user_context.last_product_ids = [p.id for p in response["products"]]
+    remember_turn(user_context, intent, response)
+    
+    user_contexts.set(user_id, user_context)
+    return intent, response
+
+def handle_query(query, user_id, request_catalog, cart, timings=None, intent=None):
+    """Run a query through intent detection, entity extraction and response generation
+    
+    A caller that already classified the query, such as the batch endpoint,
+    passes the intent so the pipeline skips detection.
+    """
+    # Debug only: the conversation log records queries without blocking on I/O
+    logger.debug("Received query: %s", query)
+    
+    started = time.perf_counter()
+    cache_key = (query.lower().strip(), request_catalog.version)
+    cached = response_cache.get(cache_key) if response_cache is not None else None
+    
+    if cached is not None:
+        # A hit skips the NLP pipeline entirely
+        intent, response = respond_from_cache(cached, user_id, request_catalog, cart)
+        entities = cached[1]
+        logger.debug("Answered intent %s from the response cache", intent)
+        stage_timings = {'cache': round((time.perf_counter() - started) * 1000, 3)}
+    else:
+        seeded = {} if intent is None else {'intent': intent}
+        run = assistant_pipeline.run(query=query, user_id=user_id, catalog=request_catalog, cart=cart, **seeded)
+        intent, response, entities = run["intent"], run["response"], run["entities"]
+        logger.debug("Detected intent: %s, entities: %s", intent, entities)
+        stage_timings = run.timings
+        
+        if response_cache is not None:
+            cached_response = None if intent in REBUILT_INTENTS else dict(response)
+            response_cache.set(cache_key, (intent, entities, cached_response))
+    
+    intents_counter.inc(intent)
+    responses_counter.inc(response.get("type", "unknown"))
+    
+    if timings is not None:
+        timings.update({f"{stage}_ms": ms for stage, ms in stage_timings.items()})
+        timings['total_ms'] = round(sum(stage_timings.values()), 3)
+    
+    # Add timestamp and the catalog version the answer was based on
+    response['timestamp'] = datetime.now().isoformat()
+    response['catalog_version'] = request_catalog.version
+    
+    if conversation_log is not None:
+        conversation_log.record({
+            'timestamp': response['timestamp'],
+            'user_id': user_id,
+            'query': query,
+            'intent': intent,
+            'entities': entities,
+            'response_type': response.get('type', 'unknown'),
+            'cached': cached is not None,
+            'catalog_version': request_catalog.version,
+            'timings_ms': stage_timings
+        })
+    
+    return response
+
+class StreamingQuery:
+    """One utterance arriving as a series of partial transcripts
+    
+    Each update advances the incremental intent and entity scans over the
+    new text only and, when the intent or entities changed, answers with a
+    provisional response built from them. The final transcript then runs
+    through handle_query like any other query, so only it touches the user
+    context and the response cache.
+    """
+    
+    def __init__(self):
+        self.intents = intent_matcher.stream()
+        self.entities = entity_index.stream()
+        self.user_id = "anonymous"
+        self.cart = []
+        self.catalog = current_catalog()
+        self.transcript = ""
+        self.started = False
+        self.done = False
+        self._last = None
+    
+    def update(self, update):
+        """Apply a codec.TranscriptUpdate; return the event to send, or None"""
+        if not self.started:
+            self.started = True
+            self.user_id = update.user_id or self.user_id
+            self.cart = update.cart if update.cart is not None else self.cart
+            self.catalog = resolve_catalog(update.products)
+        
+        self.transcript = update.transcript
+        if update.final:
+            return self.finish()
+        
+        text_lower = update.transcript.lower()
+        intent = self.intents.update(text_lower)
+        self.entities.update(text_lower)
+        entities = self.entities.extract(intent)
+        # Nothing to show yet for an intent still waiting on its entity
+        if intent == "unknown" or "" in entities.values() or (intent, entities) == self._last:
+            return None
+        self._last = (intent, entities)
+        
+        # Built against a scratch context, and without its action, since the
+        # user has not finished speaking
+        response = build_response(intent, entities, UserContext(), self.catalog, self.cart)
+        response.pop("action", None)
+        return {
+            'event': 'provisional',
+            'transcript': update.transcript,
+            'intent': intent,
+            'entities': entities,
+            'response': codec.compact_response(response)
+        }
+    
+    def finish(self):
+        """Answer the final transcript; return the event to send, or None if already answered"""
+        if self.done:
+            return None
+        self.done = True
+        
+        # The rule scan is already up to date; another engine classifies afresh
+        intent = self.intents.update(self.transcript.lower()) if intent_engine is intent_matcher else None
+        response = handle_query(self.transcript, self.user_id, self.catalog, self.cart, intent=intent)
+        return {
+            'event': 'final',
+            'transcript': self.transcript,
+            'response': codec.compact_response(response)
+        }
+
+ERROR_RESPONSE = {
+    'error': 'Failed to process request',
+    'message': 'I encountered an error processing your request. Please try again.'
+}
+
+def json_response(payload, status=200):
+    """Serialize a payload with the fast JSON codec"""
+    return Response(codec.dumps(payload), status=status, content_type='application/json')
+
+def read_body():
+    """Return the raw request body, enforcing the request size limit"""
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        raise RequestEntityTooLarge()
+    body = request.get_data(cache=False)
+    if len(body) > MAX_REQUEST_BYTES:
+        raise RequestEntityTooLarge()
+    return body
+
 @app.route('/api/assistant', methods=['POST'])
 def process_query():
+    timings = {} if should_sample() else None
     try:
-        data = request.json
-        query = data.get('query', '')
-        products = data.get('products', [])
-        cart = data.get('cart', [])
-        user_id = data.get('user_id', 'anonymous')
+        started = time.perf_counter()
+        # The raw body and its decoded dict are released once parsing returns
+        assistant_request = codec.decode_request(read_body())
+        parsed = time.perf_counter()
         
-        logger.info(f"Received query: {query}")
+        response = handle_query(
+            assistant_request.query,
+            assistant_request.user_id,
+            resolve_catalog(assistant_request.products),
+            assistant_request.cart,
+            timings
+        )
         
-        # Process the query
-        intent = detect_intent(query)
-        entities = extract_entities(query, intent)
+        serialize_started = time.perf_counter()
+        result = Response(codec.encode_response(response), content_type='application/json')
         
-        logger.info(f"Detected intent: {intent}, entities: {entities}")
+        if timings is not None:
+            timings['parse_ms'] = (parsed - started) * 1000
+            timings['serialize_ms'] = (time.perf_counter() - serialize_started) * 1000
+            record_stage_timings(timings)
+        requests_counter.inc('assistant', 'ok')
         
-        # Generate response
-        response = get_response(intent, entities, user_id, products, cart)
+        return result
+    
+    except RequestEntityTooLarge:
+        requests_counter.inc('assistant', 'too_large')
+        return json_response({'error': f'Request body exceeds {MAX_REQUEST_BYTES} bytes'}, 413)
+    
+    except codec.RequestError as e:
+        requests_counter.inc('assistant', 'invalid')
+        return json_response({'error': str(e)}, 400)
+    
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        requests_counter.inc('assistant', 'error')
+        return json_response(ERROR_RESPONSE, 500)
+
+@app.route('/api/assistant/batch', methods=['POST'])
+def process_batch():
+    """Answer a list of queries against one shared product set
+    
+    Items are processed in the order given, so queries from the same user
+    update that user's context in order.
+    """
+    try:
+        batch = codec.decode_batch(read_body())
         
-        # Add timestamp
-        response['timestamp'] = datetime.now().isoformat()
+        if len(batch.items) > MAX_BATCH_SIZE:
+            return json_response({'error': f'Batches are limited to {MAX_BATCH_SIZE} items'}, 400)
         
-        return jsonify(response)
+        request_catalog = resolve_catalog(batch.products)
+        
+        started = time.perf_counter()
+        
+        items = []
+        for index, item in enumerate(batch.items):
+            try:
+                items.append(codec.AssistantRequest.from_dict(item, batch.user_id))
+            except codec.RequestError as e:
+                # Answered with its error in the results below
+                items.append(e)
+        
+        # Classify every query in one pass, which the classifier engine vectorizes
+        queries = [item.query.lower() for item in items if isinstance(item, codec.AssistantRequest)]
+        detected = iter(intent_engine.detect_batch(queries))
+        
+        results = []
+        for index, item in enumerate(items):
+            if isinstance(item, codec.RequestError):
+                # The client's mistake, so it gets the reason rather than a logged error
+                results.append({'error': str(item), 'index': index})
+                continue
+            
+            timings = {}
+            try:
+                response = codec.compact_response(handle_query(
+                    item.query,
+                    item.user_id,
+                    request_catalog,
+                    item.cart,
+                    timings,
+                    intent=next(detected)
+                ))
+                if should_sample():
+                    record_stage_timings(timings)
+            except Exception as e:
+                # One bad item should not fail the rest of the batch
+                logger.error(f"Error processing batch item {index}: {str(e)}")
+                response = dict(ERROR_RESPONSE)
+            
+            response['index'] = index
+            response['timings'] = timings
+            results.append(response)
+        
+        requests_counter.inc('batch', 'ok')
+        return json_response({
+            'results': results,
+            'count': len(results),
+            'total_ms': round((time.perf_counter() - started) * 1000, 3),
+            'catalog_version': request_catalog.version
+        })
+    
+    except RequestEntityTooLarge:
+        requests_counter.inc('batch', 'too_large')
+        return json_response({'error': f'Request body exceeds {MAX_REQUEST_BYTES} bytes'}, 413)
+    
+    except codec.RequestError as e:
+        requests_counter.inc('batch', 'invalid')
+        return json_response({'error': str(e)}, 400)
     
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
-        return jsonify({
-            'error': 'Failed to process request',
-            'message': 'I encountered an error processing your request. Please try again.'
-        }), 500
+        logger.error(f"Error processing batch: {str(e)}")
+        requests_counter.inc('batch', 'error')
+        return json_response(ERROR_RESPONSE, 500)
+
+@app.route('/api/assistant/stream', methods=['POST'])
+def process_stream():
+    """Answer an utterance while it is still being spoken
+    
+    The body is newline-delimited JSON, one TranscriptUpdate per line as the
+    speech recognizer refines the transcript, ideally sent with chunked
+    transfer encoding. The response is newline-delimited JSON as well: a
+    provisional event whenever the detected intent or entities change, then
+    one final event with the full response.
+    
+    WSGI servers such as gunicorn hand the app a chunked body only once it
+    has fully arrived, so events come out together here; asgi.py answers
+    each line as it arrives.
+    """
+    body = request.stream
+    
+    def events():
+        session = StreamingQuery()
+        received = 0
+        try:
+            for line in body:
+                received += len(line)
+                if received > MAX_REQUEST_BYTES:
+                    raise RequestEntityTooLarge()
+                if not line.strip():
+                    continue
+                event = session.update(codec.decode_transcript_update(line))
+                if event is not None:
+                    yield codec.dumps(event) + b"\n"
+                if session.done:
+                    break
+            
+            # A body that ends without a final line finishes with its last transcript
+            event = session.finish()
+            if event is not None:
+                yield codec.dumps(event) + b"\n"
+            requests_counter.inc('stream', 'ok')
+        
+        except RequestEntityTooLarge:
+            requests_counter.inc('stream', 'too_large')
+            yield codec.dumps({'event': 'error', 'error': f'Request body exceeds {MAX_REQUEST_BYTES} bytes'}) + b"\n"
+        
+        except codec.RequestError as e:
+            requests_counter.inc('stream', 'invalid')
+            yield codec.dumps({'event': 'error', 'error': str(e)}) + b"\n"
+        
+        except Exception as e:
+            logger.error(f"Error processing stream: {str(e)}")
+            requests_counter.inc('stream', 'error')
+            yield codec.dumps(dict(ERROR_RESPONSE, event='error')) + b"\n"
+    
+    return Response(events(), content_type='application/x-ndjson')
+
+@app.route('/api/cart/summary', methods=['POST'])
+def cart_summary():
+    """Price one cart, or a list of carts for a batch quote"""
+    try:
+        summary_request = codec.decode_cart_summary(read_body())
+        
+        if len(summary_request.carts) > MAX_BATCH_SIZE:
+            return json_response({'error': f'Quotes are limited to {MAX_BATCH_SIZE} carts'}, 400)
+        
+        summaries = [summary.to_dict() for summary in pricing.summarize_carts(summary_request.carts)]
+        
+        requests_counter.inc('cart_summary', 'ok')
+        if summary_request.multiple:
+            return json_response({'summaries': summaries, 'count': len(summaries)})
+        return json_response(summaries[0])
+    
+    except RequestEntityTooLarge:
+        requests_counter.inc('cart_summary', 'too_large')
+        return json_response({'error': f'Request body exceeds {MAX_REQUEST_BYTES} bytes'}, 413)
+    
+    except codec.RequestError as e:
+        requests_counter.inc('cart_summary', 'invalid')
+        return json_response({'error': str(e)}, 400)
+    
+    except Exception as e:
+        logger.error(f"Error summarizing cart: {str(e)}")
+        requests_counter.inc('cart_summary', 'error')
+        return json_response({'error': 'Failed to summarize cart'}, 500)
+
+def health_status():
+    """Return the health report shared by every serving mode"""
+    return {
+        'status': 'ok',
+        'version': '1.0.0',
+        'startup_ms': startup_ms,
+        'json_codec': codec.BACKEND,
+        'intent_engine': type(intent_engine).__name__,
+        'pricing': pricing.BACKEND,
+        'nlp': nlp_resources.status(),
+        'text_cache': text_processing.cache_stats(),
+        'response_cache': response_cache.stats() if response_cache is not None else None,
+        'user_contexts': user_contexts.stats(),
+        'conversation_log': conversation_log.stats() if conversation_log is not None else None,
+        'catalog_journal': catalog_journal.stats() if catalog_journal is not None else None
+    }
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'version': '1.0.0'})
+    return jsonify(health_status())
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
+def apply_catalog_delta(delta):
+    """Apply a codec.CatalogDelta to the server catalog; return (status, payload)
+    
+    The new snapshot is built beside the current one, which keeps serving
+    requests, and then swapped in. With the catalog journal on, the delta
+    is recorded there too, on top of any syncs other workers recorded
+    first, and they pick it up within CATALOG_POLL_SECONDS. Raises
+    ValueError for a delta the catalog rejects.
+    """
+    global catalog
+    
+    with catalog_lock:
+        started = time.perf_counter()
+        try:
+            if catalog_journal is not None:
+                current, updated = catalog_journal.append(
+                    catalog, delta.upserts, delta.deletes, delta.base_version)
+            else:
+                current = catalog
+                if delta.base_version is not None and delta.base_version != current.version:
+                    raise CatalogConflict(current, delta.base_version)
+                updated = current.apply(delta.upserts, delta.deletes)
+        except CatalogConflict as e:
+            catalog = e.catalog
+            requests_counter.inc('catalog_sync', 'conflict')
+            return 409, {'error': str(e), 'version': e.catalog.version}
+        catalog = updated
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    
+    logger.info(f"Catalog {current.version} -> {updated.version}: "
+                f"{len(delta.upserts)} upserted, {len(delta.deletes)} deleted in {elapsed_ms} ms")
+    requests_counter.inc('catalog_sync', 'ok')
+    return 200, {
+        'version': updated.version,
+        'previous_version': current.version,
+        'products': len(updated),
+        'upserted': len(delta.upserts),
+        'deleted': len(delta.deletes),
+        'apply_ms': elapsed_ms
+    }
+
+def catalog_summary():
+    """Return the version and size of the server catalog"""
+    current = current_catalog()
+    return {'version': current.version, 'products': len(current)}
+
+@app.route('/api/catalog/sync', methods=['POST'])
+def sync_catalog():
+    """Apply product upserts and deletes to the server catalog"""
+    try:
+        status, payload = apply_catalog_delta(codec.decode_catalog_delta(read_body()))
+        return json_response(payload, status)
+    
+    except RequestEntityTooLarge:
+        requests_counter.inc('catalog_sync', 'too_large')
+        return json_response({'error': f'Request body exceeds {MAX_REQUEST_BYTES} bytes'}, 413)
+    
+    except (codec.RequestError, ValueError, TypeError) as e:
+        requests_counter.inc('catalog_sync', 'invalid')
+        return json_response({'error': str(e)}, 400)
+    
+    except Exception as e:
+        logger.error(f"Error syncing catalog: {str(e)}")
+        requests_counter.inc('catalog_sync', 'error')
+        return json_response({'error': 'Failed to sync catalog'}, 500)
+
+@app.route('/api/catalog', methods=['GET'])
+def catalog_info():
+    return jsonify(catalog_summary())
+
+# Time from first import until the app was ready to serve
+startup_ms = round((time.perf_counter() - _import_started) * 1000, 2)
+logger.info(f"Assistant backend ready in {startup_ms} ms")
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,331 @@
+"""ASGI entry point for the assistant backend.
+
+Serves the same /api/assistant, /api/assistant/stream, /api/health,
+/api/metrics, /api/catalog and /api/catalog/sync contract as the Flask app, but request bodies are read on the
+event loop, so slow uploads no longer hold a worker thread. Only the NLP
+pipeline runs in a bounded pool, and requests are turned away with 503 once
+too many are waiting for it. Streamed utterances get each partial
+transcript answered as soon as its line arrives. With ASGI_EXECUTOR=process
+each pool process holds its own catalog, so syncs only reach them through
+the catalog journal (CATALOG_JOURNAL_PATH). Request and stage metrics are
+recorded as in the Flask app; pool processes send their counts back with
+each answer.
+
+Run it with any ASGI server, for example:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Settings (environment variables):
+    ASGI_EXECUTOR        "thread" (default) or "process"
+    ASGI_POOL_SIZE       pool workers, defaults to the CPU count
+    ASGI_MAX_PENDING     queued + running pipeline jobs before shedding load
+    ASGI_MAX_STREAMS     open /api/assistant/stream requests before shedding load
+    MAX_REQUEST_BYTES    largest accepted request body, shared with the Flask app
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import app as backend
+import codec
+import metrics
+import nlp_resources
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.environ.get("ASGI_POOL_SIZE", os.cpu_count() or 1))
+MAX_PENDING = int(os.environ.get("ASGI_MAX_PENDING", POOL_SIZE * 8))
+# A stream spends most of its life waiting for the client to speak, so open
+# streams are counted apart from pipeline jobs and get a far higher limit
+MAX_STREAMS = int(os.environ.get("ASGI_MAX_STREAMS", 1000))
+MAX_BODY_BYTES = backend.MAX_REQUEST_BYTES
+USE_PROCESSES = os.environ.get("ASGI_EXECUTOR", "thread").lower() == "process"
+
+ERROR_BODY = backend.ERROR_RESPONSE
+TOO_LARGE_BODY = {'error': f'Request body exceeds {MAX_BODY_BYTES} bytes'}
+
+# Counted by handle_query wherever it runs, so pool processes return them
+POOL_COUNTERS = (backend.intents_counter, backend.responses_counter)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-allow-headers", b"Content-Type"),
+]
+
+
+class PayloadTooLarge(Exception):
+    """Raised when a request body exceeds MAX_BODY_BYTES"""
+
+
+def init_pool_process(counter):
+    """Give each pool process its own conversation log slot"""
+    if backend.conversation_log is None:
+        return
+    with counter.get_lock():
+        slot = counter.value
+        counter.value += 1
+    # Under a pre-forked server, nested in the slot of the worker that owns the pool
+    parent = backend.conversation_log.worker
+    backend.conversation_log.set_worker(slot if parent is None else f"{parent}-{slot}")
+
+
+def run_query(query, user_id, products, cart, sampled):
+    """Pipeline job run in the pool; resolves the catalog on the worker side
+
+    Returns (response, stage timings or None, counts). Counts are what a
+    pool process added to POOL_COUNTERS, for the serving process to merge;
+    threads count in place and return None.
+    """
+    timings = {} if sampled else None
+    response = backend.handle_query(query, user_id, backend.resolve_catalog(products), cart, timings)
+    counts = [counter.drain() for counter in POOL_COUNTERS] if USE_PROCESSES else None
+    return response, timings, counts
+
+
+class AssistantASGI:
+    """Minimal ASGI application wrapping the assistant pipeline"""
+
+    def __init__(self):
+        self.executor = None
+        self.pending = 0
+        self.streams = 0
+
+    def _pool(self):
+        if self.executor is None:
+            if USE_PROCESSES:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=POOL_SIZE, initializer=init_pool_process, initargs=(multiprocessing.Value("i", 0),)
+                )
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="assistant")
+        return self.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if USE_PROCESSES and backend.catalog_journal is None:
+                    logger.warning("ASGI_EXECUTOR=process without CATALOG_JOURNAL_PATH: "
+                                   "catalog syncs will not reach the pool processes")
+                # Load NLP data before the first request instead of during it
+                await asyncio.get_running_loop().run_in_executor(self._pool(), nlp_resources.prewarm)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.executor is not None:
+                    self.executor.shutdown(wait=True)
+                    self.executor = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        method = scope["method"]
+        path = scope["path"]
+
+        if method == "OPTIONS":
+            await self._respond(send, 204, None)
+        elif path == "/api/assistant" and method == "POST":
+            await self._assistant(receive, send)
+        elif path == "/api/assistant/stream" and method == "POST":
+            await self._stream(receive, send)
+        elif path == "/api/health" and method == "GET":
+            await self._respond(send, 200, backend.health_status())
+        elif path == "/api/metrics" and method == "GET":
+            body = backend.metrics_registry.render().encode("utf-8")
+            await self._respond_raw(send, 200, body, metrics.CONTENT_TYPE.encode())
+        elif path == "/api/catalog" and method == "GET":
+            await self._respond(send, 200, backend.catalog_summary())
+        elif path == "/api/catalog/sync" and method == "POST":
+            await self._catalog_sync(receive, send)
+        else:
+            await self._respond(send, 404, {'error': 'Not found'})
+
+    async def _assistant(self, receive, send):
+        counter = backend.requests_counter
+        sampled = backend.should_sample()
+        try:
+            started = time.perf_counter()
+            assistant_request = codec.decode_request(await self._read_body(receive))
+            parsed = time.perf_counter()
+        except PayloadTooLarge:
+            counter.inc('assistant', 'too_large')
+            await self._respond(send, 413, TOO_LARGE_BODY)
+            return
+        except codec.RequestError as e:
+            counter.inc('assistant', 'invalid')
+            await self._respond(send, 400, {'error': str(e)})
+            return
+
+        # Shed load here rather than letting the pool queue grow without bound
+        if self.pending >= MAX_PENDING:
+            counter.inc('assistant', 'busy')
+            await self._respond(send, 503, {'error': 'Server busy, please retry'}, [(b"retry-after", b"1")])
+            return
+
+        self.pending += 1
+        try:
+            response, timings, counts = await asyncio.get_running_loop().run_in_executor(
+                self._pool(),
+                run_query,
+                assistant_request.query,
+                assistant_request.user_id,
+                assistant_request.products,
+                assistant_request.cart,
+                sampled,
+            )
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            counter.inc('assistant', 'error')
+            await self._respond(send, 500, ERROR_BODY)
+            return
+        finally:
+            self.pending -= 1
+
+        if counts is not None:
+            for pool_counter, values in zip(POOL_COUNTERS, counts):
+                pool_counter.merge(values)
+
+        serialize_started = time.perf_counter()
+        body = codec.encode_response(response)
+        if timings is not None:
+            # Parsing here covers reading the body as well as decoding it
+            timings['parse_ms'] = (parsed - started) * 1000
+            timings['serialize_ms'] = (time.perf_counter() - serialize_started) * 1000
+            backend.record_stage_timings(timings)
+        counter.inc('assistant', 'ok')
+        await self._respond_raw(send, 200, body)
+
+    async def _catalog_sync(self, receive, send):
+        counter = backend.requests_counter
+        try:
+            delta = codec.decode_catalog_delta(await self._read_body(receive))
+            # Applied in this process, whichever executor answers queries
+            status, payload = await asyncio.get_running_loop().run_in_executor(
+                None, backend.apply_catalog_delta, delta)
+        except PayloadTooLarge:
+            counter.inc('catalog_sync', 'too_large')
+            await self._respond(send, 413, TOO_LARGE_BODY)
+            return
+        except (codec.RequestError, ValueError, TypeError) as e:
+            counter.inc('catalog_sync', 'invalid')
+            await self._respond(send, 400, {'error': str(e)})
+            return
+        except Exception as e:
+            logger.error(f"Error syncing catalog: {str(e)}")
+            counter.inc('catalog_sync', 'error')
+            await self._respond(send, 500, {'error': 'Failed to sync catalog'})
+            return
+
+        await self._respond(send, status, payload)
+
+    async def _stream(self, receive, send):
+        counter = backend.requests_counter
+        if self.streams >= MAX_STREAMS:
+            counter.inc('stream', 'busy')
+            await self._respond(send, 503, {'error': 'Server busy, please retry'}, [(b"retry-after", b"1")])
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")] + CORS_HEADERS,
+        })
+
+        # A session keeps its scan state in this process, so its updates run
+        # on the loop's default thread pool even when ASGI_EXECUTOR=process.
+        # Each stream has at most one update there at a time, so the stream
+        # limit also bounds that pool's queue
+        loop = asyncio.get_running_loop()
+        session = backend.StreamingQuery()
+        self.streams += 1
+        try:
+            async for line in self._read_lines(receive):
+                update = codec.decode_transcript_update(line)
+                event = await loop.run_in_executor(None, session.update, update)
+                if event is not None:
+                    await self._send_event(send, event)
+                if session.done:
+                    break
+            event = await loop.run_in_executor(None, session.finish)
+            if event is not None:
+                await self._send_event(send, event)
+            counter.inc('stream', 'ok')
+        except PayloadTooLarge:
+            counter.inc('stream', 'too_large')
+            await self._send_event(send, dict(TOO_LARGE_BODY, event='error'))
+        except codec.RequestError as e:
+            counter.inc('stream', 'invalid')
+            await self._send_event(send, {'event': 'error', 'error': str(e)})
+        except Exception as e:
+            logger.error(f"Error processing stream: {str(e)}")
+            counter.inc('stream', 'error')
+            await self._send_event(send, dict(ERROR_BODY, event='error'))
+        finally:
+            self.streams -= 1
+
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _send_event(self, send, event):
+        await send({"type": "http.response.body", "body": codec.dumps(event) + b"\n", "more_body": True})
+
+    async def _read_lines(self, receive):
+        """Yield each non-blank line of the request body as soon as it is complete"""
+        buffer = b""
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise PayloadTooLarge()
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+            if not message.get("more_body", False):
+                break
+        if buffer.strip():
+            yield buffer
+
+    async def _read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise PayloadTooLarge()
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def _respond(self, send, status, payload, extra_headers=()):
+        body = b"" if payload is None else codec.dumps(payload)
+        await self._respond_raw(send, status, body, extra_headers=extra_headers)
+
+    async def _respond_raw(self, send, status, body, content_type=b"application/json", extra_headers=()):
+        headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers + CORS_HEADERS + list(extra_headers),
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+app = AssistantASGI()
@@ -0,0 +1,311 @@
+"""Benchmark harness for the assistant pipeline.
+
+Drives detect_intent, extract_entities, get_response and the full
+/api/assistant route (through Flask's test client) with a synthetic query
+corpus generated from the intent patterns, against synthetic catalogs of
+increasing size. Reports throughput, p50/p95/p99 latency and peak memory,
+and writes the results as JSON. The route runs twice: "route" with the
+response cache off, so it measures the pipeline itself, and "route_cached"
+with every query already cached.
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.2
+
+With --baseline, any benchmark whose p95 latency grew by more than the
+tolerance is reported and the exit status is 1.
+
+With --replay, the queries and user ids come from a conversation log
+(plain or gzipped) instead of the synthetic corpus:
+
+    python benchmark.py --replay logs/conversations.jsonl --queries 10000
+"""
+import argparse
+import gc
+import json
+import logging
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import app as backend
+from catalog import Catalog
+from conversation_log import read_events
+from models import CartItem
+
+ADJECTIVES = [
+    "wireless", "premium", "organic", "smart", "portable", "classic", "compact", "leather",
+    "stainless", "ceramic", "vintage", "waterproof", "ergonomic", "lightweight", "bamboo",
+    "cotton", "denim", "scented", "digital", "foldable",
+]
+NOUNS = [
+    "headphones", "shirt", "watch", "knife", "bag", "speaker", "shoes", "bottle", "pot",
+    "jacket", "candle", "lamp", "blanket", "backpack", "keyboard", "mug", "scarf", "sneakers",
+    "blender", "pillow", "charger", "wallet", "kettle", "sunglasses",
+]
+FILLERS = ["", "please", "a", "some", "the best", "cheap", "new"]
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def synthetic_catalog(size, rng):
+    """Generate a catalog of size products over the store's categories"""
+    products = []
+    for product_id in range(1, size + 1):
+        adjective = rng.choice(ADJECTIVES)
+        noun = rng.choice(NOUNS)
+        category = rng.choice(backend.product_categories).title()
+        products.append({
+            "id": product_id,
+            "name": f"{adjective.title()} {noun.title()} {product_id}",
+            "price": round(rng.uniform(5, 500), 2),
+            "description": f"A {adjective} {noun} from our {category.lower()} range. "
+                           f"{rng.choice(ADJECTIVES).title()} design with {rng.choice(ADJECTIVES)} finish.",
+            "category": category,
+            "rating": round(rng.uniform(3, 5), 1),
+            "discount": rng.choice([0, 0, 0, 10, 15, 20]),
+            "stock": rng.randint(0, 200),
+        })
+    return products
+
+
+def synthetic_queries(count, rng):
+    """Generate queries by filling the intent patterns with products and sections"""
+    destinations = list(backend.website_structure)
+    for section_data in backend.website_structure.values():
+        destinations.extend(section_data["aliases"])
+
+    templates = []
+    for intent_name, intent_data in backend.intents.items():
+        for pattern in intent_data.get("patterns", []):
+            templates.append((intent_name, pattern))
+
+    queries = []
+    for _ in range(count):
+        intent_name, pattern = rng.choice(templates)
+        if intent_name == "navigation":
+            tail = rng.choice(destinations)
+        elif intent_name == "section_inquiry":
+            tail = f"a {rng.choice(destinations)}"
+        elif intent_name in ("find_product", "add_to_cart", "product_info"):
+            tail = f"{rng.choice(FILLERS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}".strip()
+        else:
+            tail = ""
+        queries.append(f"{pattern} {tail}".strip())
+    return queries
+
+
+def synthetic_cart(rng):
+    return [
+        CartItem(i, round(rng.uniform(5, 200), 2), rng.randint(1, 3))
+        for i in range(rng.randint(0, 5))
+    ]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def measure(name, func, inputs, memory_sample=200):
+    """Time func over every input, then measure peak memory over a sample"""
+    latencies = []
+    gc.collect()
+    started = time.perf_counter()
+    for args in inputs:
+        call_started = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    # tracemalloc slows every allocation, so it gets its own shorter pass
+    tracemalloc.start()
+    for args in inputs[:memory_sample]:
+        func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "name": name,
+        "calls": len(inputs),
+        "throughput_per_s": round(len(inputs) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def build_catalog(products):
+    """Build a catalog and its search index, reporting time and peak memory"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    catalog = Catalog(products)
+    catalog.search_index
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return catalog, {
+        "build_s": round(elapsed, 3),
+        "build_peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def replayed_traffic(paths, count):
+    """Return up to count (query, user_id) pairs, and the lines skipped, from conversation log files"""
+    traffic, skipped = [], 0
+
+    def malformed(path, number, error):
+        nonlocal skipped
+        skipped += 1
+
+    for path in paths:
+        for event in read_events(path, malformed):
+            query, user_id = event.get("query"), event.get("user_id")
+            if not query or not isinstance(query, str):
+                skipped += 1
+                continue
+            traffic.append((query, user_id if isinstance(user_id, str) and user_id else "anonymous"))
+            if len(traffic) == count:
+                return traffic, skipped
+    return traffic, skipped
+
+
+def run_size(size, query_count, seed, traffic=None):
+    """Run every benchmark against one synthetic catalog size"""
+    rng = random.Random(seed)
+    catalog, build = build_catalog(synthetic_catalog(size, rng))
+    if traffic:
+        queries = [query for query, _ in traffic]
+        user_ids = [user_id for _, user_id in traffic]
+    else:
+        queries = synthetic_queries(query_count, rng)
+        user_ids = [f"user-{rng.randint(1, 500)}" for _ in queries]
+    carts = [synthetic_cart(rng) for _ in queries]
+
+    # The route answers from the server catalog when no products are posted
+    backend.catalog = catalog
+
+    intents = [backend.detect_intent(query) for query in queries]
+    entities = [backend.extract_entities(query, intent) for query, intent in zip(queries, intents)]
+    client = backend.app.test_client()
+
+    def post(query, user_id, cart):
+        body = {"query": query, "user_id": user_id, "cart": [item.to_dict() for item in cart]}
+        response = client.post("/api/assistant", json=body)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/assistant returned {response.status_code} for {query!r}")
+
+    benchmarks = [
+        measure("detect_intent", backend.detect_intent, [(q,) for q in queries]),
+        measure("extract_entities", backend.extract_entities, list(zip(queries, intents))),
+        measure(
+            "get_response",
+            backend.get_response,
+            [(i, e, u, catalog, c) for i, e, u, c in zip(intents, entities, user_ids, carts)],
+        ),
+    ]
+
+    requests = list(zip(queries, user_ids, carts))
+    cache = backend.response_cache
+    backend.response_cache = None
+    try:
+        benchmarks.append(measure("route", post, requests))
+    finally:
+        backend.response_cache = cache
+    if cache is not None:
+        cache.clear()
+        for args in requests:
+            post(*args)
+        benchmarks.append(measure("route_cached", post, requests))
+        cache.clear()
+    return {"catalog_size": size, "queries": len(queries), "catalog": build, "benchmarks": benchmarks}
+
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of benchmarks whose p95 grew beyond tolerance"""
+    previous = {
+        (run["catalog_size"], bench["name"]): bench
+        for run in baseline.get("runs", [])
+        for bench in run["benchmarks"]
+    }
+    regressions = []
+    for run in results["runs"]:
+        for bench in run["benchmarks"]:
+            before = previous.get((run["catalog_size"], bench["name"]))
+            if not before or not before["p95_ms"]:
+                continue
+            change = bench["p95_ms"] / before["p95_ms"] - 1.0
+            if change > tolerance:
+                regressions.append(
+                    f"{bench['name']} @ {run['catalog_size']} products: "
+                    f"p95 {before['p95_ms']}ms -> {bench['p95_ms']}ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the assistant pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic catalog sizes")
+    parser.add_argument("--queries", type=int, default=2000, help="queries per catalog size")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for reproducible corpora")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare p95 latencies against an earlier results file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    parser.add_argument("--replay", nargs="+", help="conversation log files to take the queries from")
+    args = parser.parse_args(argv)
+
+    traffic = None
+    if args.replay:
+        traffic, skipped = replayed_traffic(args.replay, args.queries)
+        if skipped:
+            print(f"Skipped {skipped} malformed or query-less log lines", file=sys.stderr)
+        if not traffic:
+            print("No queries found in the replayed logs", file=sys.stderr)
+            return 1
+
+    # Per-request INFO logging would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "replay": args.replay,
+        "runs": [],
+    }
+    for size in args.sizes:
+        run = run_size(size, args.queries, args.seed, traffic)
+        results["runs"].append(run)
+        for bench in run["benchmarks"]:
+            print(
+                f"{size:>7} products  {bench['name']:<17} {bench['throughput_per_s']:>10.1f}/s  "
+                f"p50 {bench['p50_ms']:.3f}ms  p95 {bench['p95_ms']:.3f}ms  p99 {bench['p99_ms']:.3f}ms  "
+                f"peak {bench['peak_memory_kb']:.0f}KB"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
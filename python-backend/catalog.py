@@ -0,0 +1,192 @@
+"""Server-side product catalog.
+
+The catalog is loaded once at startup (by default from data/products.json,
+exported from lib/product-data.js) and indexed by id and category, with a
+ranked search index for product queries. Later changes arrive as deltas and
+produce new versioned snapshots instead of a rebuild.
+"""
+import hashlib
+import json
+import logging
+import os
+from bisect import insort
+
+from models import Product
+from search import ProductSearchIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "products.json")
+
+# Share of a product name lookup that must match for it to pick a product
+NAME_MATCH_COVERAGE = 0.6
+
+# Product fields the search index reads; changes to others skip reindexing
+SEARCHED_FIELDS = ("name", "category", "description")
+
+# Deleted slots tolerated before apply() renumbers the catalog
+COMPACT_MIN_DELETED = 1024
+
+
+def compute_version(products):
+    """Return a short content hash identifying a list of products"""
+    products = [p.to_dict() if isinstance(p, Product) else p for p in products]
+    digest = hashlib.sha1(json.dumps(products, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class Catalog:
+    """Snapshot of the product list with id and category indexes and ranked search
+
+    A catalog is never modified once built. apply() returns a new snapshot
+    sharing everything the changes did not touch, so a request keeps reading
+    the snapshot it started with, without locks, while updates are applied.
+    """
+
+    def __init__(self, products, version=None):
+        products = list(products)
+        self.version = version or compute_version(products)
+        # Document number -> product; deleted products leave None behind so
+        # the search index's document numbers stay valid
+        self.docs = [p if isinstance(p, Product) else Product.from_dict(p) for p in products]
+        self.deleted = 0
+        self._search_index = None
+
+        self.by_id = {}
+        self.doc_ids = {}
+        self.by_category = {}
+        for doc, product in enumerate(self.docs):
+            self.by_id[product.id] = product
+            self.doc_ids[product.id] = doc
+            self.by_category.setdefault(product.category.lower(), []).append(doc)
+
+    def __len__(self):
+        return len(self.docs) - self.deleted
+
+    @property
+    def products(self):
+        """The products in catalog order"""
+        if not self.deleted:
+            return list(self.docs)
+        return [product for product in self.docs if product is not None]
+
+    @property
+    def search_index(self):
+        # Built on first use so catalogs posted with a request stay cheap
+        if self._search_index is None:
+            self._search_index = ProductSearchIndex(self.docs)
+        return self._search_index
+
+    def get(self, product_id):
+        """Return the product with the given id, or None"""
+        return self.by_id.get(product_id)
+
+    def in_category(self, category):
+        """Return the products in a category, in catalog order"""
+        return [self.docs[doc] for doc in self.by_category.get(category.lower(), [])]
+
+    def search(self, query, limit=3):
+        """Return (number of matches, best-ranked products) for a product query"""
+        total, docs = self.search_index.search(query, limit)
+        return total, [self.docs[doc] for doc in docs]
+
+    def best_match(self, name):
+        """Return the product whose name best matches name, or None"""
+        _, docs = self.search_index.search(name, 1, view="name", min_coverage=NAME_MATCH_COVERAGE)
+        return self.docs[docs[0]] if docs else None
+
+    def apply(self, upserts=(), deletes=()):
+        """Return a new snapshot with products upserted and deleted by id
+
+        An upsert for an existing id carries only the fields that changed,
+        and one that leaves the name, category and description alone (a price
+        or stock change) does not touch the search index. New products need
+        at least a name and a price. Raises ValueError for an invalid change.
+        """
+        snapshot = Catalog([], self.version)
+        snapshot.docs = list(self.docs)
+        snapshot.deleted = self.deleted
+        snapshot.by_id = dict(self.by_id)
+        snapshot.doc_ids = dict(self.doc_ids)
+        snapshot.by_category = dict(self.by_category)
+        snapshot._search_index = self._search_index.copy() if self._search_index is not None else None
+
+        # Category lists copied into the snapshot so far
+        owned = set()
+
+        def category_docs(category):
+            key = category.lower()
+            if key not in owned:
+                snapshot.by_category[key] = list(snapshot.by_category.get(key, ()))
+                owned.add(key)
+            return snapshot.by_category[key]
+
+        for changes in upserts:
+            product_id = changes["id"]
+            doc = snapshot.doc_ids.get(product_id)
+            current = snapshot.docs[doc] if doc is not None else None
+            if current is None and ("name" not in changes or "price" not in changes):
+                raise ValueError(f"New product {product_id!r} needs a name and a price")
+            product = Product.from_dict(dict(current.to_dict(), **changes) if current else changes)
+
+            if current is None:
+                doc = len(snapshot.docs)
+                snapshot.docs.append(product)
+                snapshot.doc_ids[product_id] = doc
+                category_docs(product.category).append(doc)
+                if snapshot._search_index is not None:
+                    snapshot._search_index.add(doc, product)
+            else:
+                snapshot.docs[doc] = product
+                if product.category.lower() != current.category.lower():
+                    category_docs(current.category).remove(doc)
+                    insort(category_docs(product.category), doc)
+                text_changed = any(
+                    getattr(product, field) != getattr(current, field) for field in SEARCHED_FIELDS
+                )
+                if text_changed and snapshot._search_index is not None:
+                    snapshot._search_index.remove(doc, current)
+                    snapshot._search_index.add(doc, product)
+            snapshot.by_id[product_id] = product
+
+        for product_id in deletes:
+            doc = snapshot.doc_ids.pop(product_id, None)
+            if doc is None:
+                continue
+            current = snapshot.docs[doc]
+            snapshot.docs[doc] = None
+            snapshot.deleted += 1
+            del snapshot.by_id[product_id]
+            category_docs(current.category).remove(doc)
+            if snapshot._search_index is not None:
+                snapshot._search_index.remove(doc, current)
+
+        delta = json.dumps([list(upserts), list(deletes)], sort_keys=True, default=str)
+        snapshot.version = hashlib.sha1(f"{self.version}:{delta}".encode("utf-8")).hexdigest()[:12]
+
+        # Renumber once deleted slots outweigh the live products
+        if snapshot.deleted > max(COMPACT_MIN_DELETED, len(snapshot)):
+            compacted = Catalog(snapshot.products, snapshot.version)
+            if snapshot._search_index is not None:
+                compacted.search_index
+            return compacted
+        return snapshot
+
+
+def load_catalog(path=None):
+    """Load the catalog from a JSON file of products and build its search index"""
+    path = path or os.environ.get("CATALOG_PATH", DEFAULT_CATALOG_PATH)
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            products = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Catalog file not found at {path}, starting with an empty catalog")
+        products = []
+
+    catalog = Catalog(products)
+
+    # Build the search index now rather than on the first query
+    catalog.search_index
+    logger.info(f"Loaded catalog {catalog.version} with {len(catalog)} products from {path}")
+    return catalog
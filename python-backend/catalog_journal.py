@@ -0,0 +1,196 @@
+"""Shared, append-only journal of catalog syncs.
+
+Every worker holds its own catalog snapshot in memory. A sync received by
+one worker is appended here, in a SQLite file every worker on the host can
+open, as a row naming the catalog version it applies to and the version it
+produces. Workers follow that chain from the version they hold, so a delta
+synced to any one of them reaches the rest.
+
+Every CATALOG_CHECKPOINT_INTERVAL deltas the append also stores the whole
+product list as a checkpoint. A worker more than that many deltas behind (a
+restart, or a replacement forked from the master's startup catalog) loads
+the newest checkpoint of its chain and replays only the deltas after it, so
+catching up costs the same however long the host has been running.
+
+Appends run in an exclusive transaction after catching up with the
+journal, so base_version checks and the chain itself stay linear across
+workers. Deltas are keyed by the version they apply to: re-exporting the
+catalog file changes its version and starts a new chain, and the rows of
+the old one are simply never read again.
+
+Settings (environment variables):
+    CATALOG_JOURNAL_PATH          SQLite file holding the journal; off when unset
+    CATALOG_CHECKPOINT_INTERVAL   deltas between checkpoints, default 100
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from catalog import Catalog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_INTERVAL = 100
+
+
+class CatalogConflict(Exception):
+    """Raised when a delta names a base version other than the journal's latest"""
+
+    def __init__(self, catalog, base_version):
+        super().__init__(f"Catalog is at version {catalog.version}, not {base_version}")
+        # The latest snapshot, caught up with the journal
+        self.catalog = catalog
+        self.base_version = base_version
+
+
+class CatalogJournal:
+    """Catalog deltas in a SQLite file shared by every worker on the host"""
+
+    def __init__(self, path, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self._local = threading.local()
+
+        conn = self._connection()
+        # root_version is the catalog the chain started from and depth the
+        # number of deltas since, so a worker can tell which checkpoints are
+        # ahead of the version it holds
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_deltas ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, parent_version TEXT NOT NULL, "
+            "version TEXT NOT NULL, root_version TEXT NOT NULL, depth INTEGER NOT NULL, "
+            "delta TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS catalog_deltas_parent ON catalog_deltas (parent_version)")
+        conn.execute("CREATE INDEX IF NOT EXISTS catalog_deltas_version ON catalog_deltas (version)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_checkpoints ("
+            "version TEXT PRIMARY KEY, root_version TEXT NOT NULL, depth INTEGER NOT NULL, "
+            "products TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        # Same rules as the SQLite context store: one connection per thread,
+        # never one inherited from the process this one was forked from
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit, so appends can take the write lock up front
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _position(self, conn, version):
+        """Return (root_version, depth) of a version; a version the journal never produced starts a chain"""
+        row = conn.execute(
+            "SELECT root_version, depth FROM catalog_deltas WHERE version = ? ORDER BY seq DESC LIMIT 1",
+            (version,),
+        ).fetchone()
+        return row if row is not None else (version, 0)
+
+    def _restore(self, conn, catalog):
+        """Return the newest checkpoint of catalog's chain if catalog is a full interval behind it"""
+        root_version, depth = self._position(conn, catalog.version)
+        row = conn.execute(
+            "SELECT version, products FROM catalog_checkpoints "
+            "WHERE root_version = ? AND depth >= ? ORDER BY depth DESC LIMIT 1",
+            (root_version, depth + self.checkpoint_interval),
+        ).fetchone()
+        if row is None:
+            return catalog
+        version, products = row
+        restored = Catalog(json.loads(products), version)
+        # Built here, while catching up, rather than on the first query
+        restored.search_index
+        return restored
+
+    def _follow(self, conn, catalog):
+        """Apply the journaled deltas that continue from catalog's version"""
+        catalog = self._restore(conn, catalog)
+        while True:
+            row = conn.execute(
+                "SELECT version, delta FROM catalog_deltas WHERE parent_version = ? ORDER BY seq LIMIT 1",
+                (catalog.version,),
+            ).fetchone()
+            if row is None:
+                return catalog
+            version, delta = row
+            delta = json.loads(delta)
+            updated = catalog.apply(delta["upsert"], delta["delete"])
+            if updated.version != version:
+                # Only a change to how versions are computed gets here
+                logger.error(f"Journaled delta {catalog.version} -> {version} replayed as {updated.version}; "
+                             f"not following the journal further")
+                return catalog
+            catalog = updated
+
+    def catch_up(self, catalog):
+        """Return catalog with every delta journaled after its version applied"""
+        return self._follow(self._connection(), catalog)
+
+    def append(self, catalog, upserts, deletes, base_version=None):
+        """Apply a delta on top of the journal's latest version and record it
+
+        Returns (previous, updated) snapshots. Raises CatalogConflict when
+        base_version is given and is not the latest version, and ValueError
+        when Catalog.apply rejects the delta; nothing is recorded then.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = self._follow(conn, catalog)
+            if base_version is not None and base_version != current.version:
+                raise CatalogConflict(current, base_version)
+            updated = current.apply(upserts, deletes)
+            root_version, depth = self._position(conn, current.version)
+            depth += 1
+            now = time.time()
+            conn.execute(
+                "INSERT INTO catalog_deltas (parent_version, version, root_version, depth, delta, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (current.version, updated.version, root_version, depth,
+                 json.dumps({"upsert": list(upserts), "delete": list(deletes)}), now),
+            )
+            if depth % self.checkpoint_interval == 0:
+                self._checkpoint(conn, updated, root_version, depth, now)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return current, updated
+
+    def _checkpoint(self, conn, catalog, root_version, depth, now):
+        """Store catalog's products, replacing the chain's older checkpoint"""
+        conn.execute(
+            "INSERT OR REPLACE INTO catalog_checkpoints (version, root_version, depth, products, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (catalog.version, root_version, depth,
+             json.dumps([product.to_dict() for product in catalog.products]), now),
+        )
+        conn.execute(
+            "DELETE FROM catalog_checkpoints WHERE root_version = ? AND depth < ?", (root_version, depth)
+        )
+
+    def stats(self):
+        conn = self._connection()
+        count, latest = conn.execute("SELECT COUNT(*), MAX(created_at) FROM catalog_deltas").fetchone()
+        (checkpoints,) = conn.execute("SELECT COUNT(*) FROM catalog_checkpoints").fetchone()
+        return {"path": self.path, "deltas": count, "latest_at": latest, "checkpoints": checkpoints,
+                "checkpoint_interval": self.checkpoint_interval}
+
+
+def create_catalog_journal(path=None):
+    """Open the journal at path or CATALOG_JOURNAL_PATH, or return None if it is off"""
+    path = path or os.environ.get("CATALOG_JOURNAL_PATH")
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    interval = int(os.environ.get("CATALOG_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL))
+    return CatalogJournal(path, max(1, interval))
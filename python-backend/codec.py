@@ -0,0 +1,333 @@
+"""JSON encoding and request/response schemas for the assistant API.
+
+Uses orjson or msgspec when one is installed and falls back to the standard
+library otherwise. Requests are decoded straight from the raw body into
+typed objects, so no decoded copy of the whole body outlives parsing, and
+responses carry only the product fields the front end renders.
+"""
+import json
+import math
+
+from models import CartItem
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _loads = msgspec.json.decode
+    _dumps = msgspec.json.encode
+else:
+    BACKEND = "json"
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# Product fields the voice assistant UI reads from responses
+RESPONSE_PRODUCT_FIELDS = ("id", "name", "price", "discount", "image")
+
+_NUMBER = ((int, float), "a number")
+_STRING = ((str,), "a string")
+
+# Accepted JSON types of product fields posted by clients
+PRODUCT_FIELD_TYPES = {
+    "id": ((str, int), "a string or an integer"),
+    "name": _STRING,
+    "price": _NUMBER,
+    "description": _STRING,
+    "category": _STRING,
+    "image": ((str, type(None)), "a string or null"),
+    "rating": ((int, float, type(None)), "a number or null"),
+    "reviews": ((int,), "an integer"),
+    "discount": _NUMBER,
+    "stock": ((int,), "an integer"),
+}
+
+# Fields a product posted with a request must have
+REQUIRED_PRODUCT_FIELDS = ("id", "name", "price")
+
+# Accepted JSON types of cart item fields; only price is required
+CART_ITEM_FIELD_TYPES = {
+    "id": ((str, int, type(None)), "a string, an integer or null"),
+    "name": ((str, type(None)), "a string or null"),
+    "price": _NUMBER,
+    "quantity": ((int,), "an integer"),
+    "discount": ((int, float, type(None)), "a number or null"),
+}
+
+# Bounds that keep every cart total finite and exact enough to quote
+MAX_CART_PRICE = 1e9
+MAX_CART_QUANTITY = 1000000
+
+
+class RequestError(ValueError):
+    """Raised when a request body is not valid for its endpoint"""
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    try:
+        return _loads(data)
+    except ValueError as e:
+        # orjson and msgspec errors subclass ValueError too
+        raise RequestError(f"Request body is not valid JSON: {e}") from e
+
+
+def dumps(obj):
+    """Encode obj as UTF-8 JSON bytes"""
+    return _dumps(obj)
+
+
+def _field(data, name, kind, default):
+    value = data.get(name, default)
+    if value is None:
+        return default
+    if not isinstance(value, kind):
+        raise RequestError(f"'{name}' must be of type {kind.__name__}")
+    return value
+
+
+def _cart_item(item):
+    if not isinstance(item, dict):
+        raise RequestError("Invalid cart item: every cart item must be a JSON object")
+    if "price" not in item:
+        raise RequestError(f"Invalid cart item {item.get('id')!r}: missing 'price'")
+    for name, (kinds, description) in CART_ITEM_FIELD_TYPES.items():
+        if name in item:
+            value = item[name]
+            # JSON true and false would otherwise pass as numbers
+            if isinstance(value, bool) or not isinstance(value, kinds):
+                raise RequestError(f"Invalid cart item {item.get('id')!r}: '{name}' must be {description}")
+
+    price, quantity, discount = item["price"], item.get("quantity", 1), item.get("discount") or 0
+    if not (math.isfinite(price) and 0 <= price <= MAX_CART_PRICE):
+        raise RequestError(f"Invalid cart item {item.get('id')!r}: 'price' must be from 0 to {MAX_CART_PRICE:g}")
+    if not 1 <= quantity <= MAX_CART_QUANTITY:
+        raise RequestError(f"Invalid cart item {item.get('id')!r}: 'quantity' must be from 1 to {MAX_CART_QUANTITY}")
+    if not (math.isfinite(discount) and 0 <= discount <= 100):
+        raise RequestError(f"Invalid cart item {item.get('id')!r}: 'discount' must be a percentage from 0 to 100")
+    return CartItem.from_dict(item)
+
+
+def _cart(items):
+    return [_cart_item(item) for item in items]
+
+
+def _product(product, required=REQUIRED_PRODUCT_FIELDS):
+    if not isinstance(product, dict):
+        raise RequestError("Every product must be a JSON object")
+    if "id" in required and "id" not in product:
+        raise RequestError("Every product must have an 'id'")
+    for name in required:
+        if name not in product:
+            raise RequestError(f"Product {product['id']!r} is missing '{name}'")
+    for name, (kinds, description) in PRODUCT_FIELD_TYPES.items():
+        if name in product:
+            value = product[name]
+            # JSON true and false would otherwise pass as integers
+            if isinstance(value, bool) or not isinstance(value, kinds):
+                raise RequestError(f"Product {product.get('id')!r}: '{name}' must be {description}")
+    return product
+
+
+def _products(products):
+    if not products:
+        return None
+    return [_product(product) for product in products]
+
+
+class AssistantRequest:
+    """A single assistant query"""
+
+    __slots__ = ("query", "user_id", "cart", "products")
+
+    def __init__(self, query="", user_id="anonymous", cart=None, products=None):
+        self.query = query
+        self.user_id = user_id
+        self.cart = cart if cart is not None else []
+        self.products = products
+
+    @classmethod
+    def from_dict(cls, data, default_user_id="anonymous"):
+        """Validate a decoded JSON object"""
+        if not isinstance(data, dict):
+            raise RequestError("Expected a JSON object")
+        return cls(
+            query=_field(data, "query", str, ""),
+            user_id=_field(data, "user_id", str, default_user_id),
+            cart=_cart(_field(data, "cart", list, [])),
+            products=_products(_field(data, "products", list, None)),
+        )
+
+
+class TranscriptUpdate:
+    """One line of a streamed utterance: the transcript so far
+
+    The first line may also carry user_id, cart and products, which apply
+    to the whole utterance. final marks the finished transcript.
+    """
+
+    __slots__ = ("transcript", "final", "user_id", "cart", "products")
+
+    def __init__(self, transcript="", final=False, user_id=None, cart=None, products=None):
+        self.transcript = transcript
+        self.final = final
+        self.user_id = user_id
+        self.cart = cart
+        self.products = products
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate a decoded JSON object"""
+        if not isinstance(data, dict):
+            raise RequestError("Expected a JSON object")
+        cart = _field(data, "cart", list, None)
+        return cls(
+            transcript=_field(data, "transcript", str, ""),
+            final=_field(data, "final", bool, False),
+            user_id=_field(data, "user_id", str, None),
+            cart=_cart(cart) if cart is not None else None,
+            products=_products(_field(data, "products", list, None)),
+        )
+
+
+class BatchRequest:
+    """A list of assistant queries sharing one product set"""
+
+    __slots__ = ("items", "products", "user_id")
+
+    def __init__(self, items, products=None, user_id="anonymous"):
+        self.items = items
+        self.products = products
+        self.user_id = user_id
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate a decoded JSON object; items stay raw so each can fail alone"""
+        if not isinstance(data, dict):
+            raise RequestError("Expected a JSON object")
+        items = data.get("items")
+        if not isinstance(items, list) or not items:
+            raise RequestError("Expected a non-empty list of items")
+        return cls(
+            items=items,
+            products=_products(_field(data, "products", list, None)),
+            user_id=_field(data, "user_id", str, "anonymous"),
+        )
+
+
+class CartSummaryRequest:
+    """One cart, or several carts priced together as a quote"""
+
+    __slots__ = ("carts", "multiple")
+
+    def __init__(self, carts, multiple=False):
+        self.carts = carts
+        self.multiple = multiple
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate a decoded JSON object holding either 'cart' or 'carts'"""
+        if not isinstance(data, dict):
+            raise RequestError("Expected a JSON object")
+        carts = _field(data, "carts", list, None)
+        if carts is None:
+            return cls([_cart(_field(data, "cart", list, []))])
+        if not all(isinstance(cart, list) for cart in carts):
+            raise RequestError("'carts' must be a list of carts")
+        return cls([_cart(cart) for cart in carts], multiple=True)
+
+
+class CatalogDelta:
+    """Product changes for the server catalog
+
+    upsert holds product objects keyed by "id"; for existing products only
+    the changed fields need to be sent. delete holds product ids. When
+    base_version is given, the change only applies to that catalog version.
+    """
+
+    __slots__ = ("upserts", "deletes", "base_version")
+
+    def __init__(self, upserts=(), deletes=(), base_version=None):
+        self.upserts = upserts
+        self.deletes = deletes
+        self.base_version = base_version
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate a decoded JSON object"""
+        if not isinstance(data, dict):
+            raise RequestError("Expected a JSON object")
+        # Only the id is required here; Catalog.apply checks that new
+        # products also have a name and a price
+        upserts = [_product(product, required=("id",)) for product in _field(data, "upsert", list, [])]
+        deletes = _field(data, "delete", list, [])
+        id_kinds, id_description = PRODUCT_FIELD_TYPES["id"]
+        if any(isinstance(product_id, bool) or not isinstance(product_id, id_kinds) for product_id in deletes):
+            raise RequestError(f"Every deleted id must be {id_description}")
+        return cls(
+            upserts=upserts,
+            deletes=deletes,
+            base_version=_field(data, "base_version", str, None),
+        )
+
+
+def decode_request(body):
+    """Decode a raw /api/assistant body into an AssistantRequest"""
+    return AssistantRequest.from_dict(loads(body))
+
+
+def decode_batch(body):
+    """Decode a raw /api/assistant/batch body into a BatchRequest"""
+    return BatchRequest.from_dict(loads(body))
+
+
+def decode_cart_summary(body):
+    """Decode a raw /api/cart/summary body into a CartSummaryRequest"""
+    return CartSummaryRequest.from_dict(loads(body))
+
+
+def decode_catalog_delta(body):
+    """Decode a raw /api/catalog/sync body into a CatalogDelta"""
+    return CatalogDelta.from_dict(loads(body))
+
+
+def decode_transcript_update(line):
+    """Decode one NDJSON line of /api/assistant/stream into a TranscriptUpdate"""
+    return TranscriptUpdate.from_dict(loads(line))
+
+
+def compact_product(product):
+    """Keep only the product fields included in responses"""
+    if isinstance(product, dict):
+        return {field: product[field] for field in RESPONSE_PRODUCT_FIELDS if field in product}
+    return {field: getattr(product, field) for field in RESPONSE_PRODUCT_FIELDS}
+
+
+def compact_response(response):
+    """Return a copy of a response with its products trimmed for the client"""
+    if "products" not in response and "product" not in response:
+        return response
+    compact = dict(response)
+    if "products" in compact:
+        compact["products"] = [compact_product(p) for p in compact["products"]]
+    if "product" in compact:
+        compact["product"] = compact_product(compact["product"])
+    return compact
+
+
+def encode_response(response):
+    """Serialize a response for the client"""
+    return dumps(compact_response(response))
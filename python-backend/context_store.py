@@ -0,0 +1,359 @@
+"""Per-user conversation context storage.
+
+Contexts live in a bounded in-process LRU by default. Deployments running
+several workers can point CONTEXT_STORE_URL at a shared SQLite file or Redis
+server so a user's context survives whichever worker serves the next request:
+
+    memory://                      in-process LRU (default)
+    sqlite:///var/lib/assistant/contexts.db
+    redis://[:password@]host:6379/0
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+from models import UserContext
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_USERS = 10000
+DEFAULT_TTL_SECONDS = 3600
+
+
+class ContextStoreError(Exception):
+    """Raised when a context store backend cannot serve a request"""
+
+
+class ContextStore:
+    """Interface shared by all context store backends"""
+
+    def get(self, user_id):
+        """Return the stored context for user_id, or None"""
+        raise NotImplementedError
+
+    def set(self, user_id, context):
+        """Store the context for user_id"""
+        raise NotImplementedError
+
+    def delete(self, user_id):
+        """Forget the context for user_id"""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self):
+        """Return backend name, size and hit/miss/eviction counts"""
+        raise NotImplementedError
+
+
+class MemoryContextStore(ContextStore):
+    """Contexts held in this process, capped in size and idle time"""
+
+    def __init__(self, max_size=DEFAULT_MAX_USERS, ttl=DEFAULT_TTL_SECONDS):
+        self._cache = TTLCache(max_size, ttl)
+
+    def get(self, user_id):
+        return self._cache.get(user_id)
+
+    def set(self, user_id, context):
+        self._cache.set(user_id, context)
+
+    def delete(self, user_id):
+        self._cache.pop(user_id)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        return dict(self._cache.stats(), backend="memory")
+
+
+class SQLiteContextStore(ContextStore):
+    """Contexts in a SQLite file shared by every worker on the host"""
+
+    # Expired and surplus rows are pruned once every this many writes
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, path, max_size=DEFAULT_MAX_USERS, ttl=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_contexts ("
+                "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                "expires_at REAL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS user_contexts_updated ON user_contexts (updated_at)")
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads, nor with
+        # workers forked from a parent that already opened one
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, user_id):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT data, expires_at FROM user_contexts WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        data, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            with conn:
+                conn.execute("DELETE FROM user_contexts WHERE user_id = ?", (user_id,))
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return UserContext.from_dict(json.loads(data))
+
+    def set(self, user_id, context):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO user_contexts (user_id, data, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, json.dumps(context.to_dict()), expires_at, now),
+            )
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_INTERVAL == 0
+        if prune:
+            self._prune(conn, now)
+
+    def _prune(self, conn, now):
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM user_contexts WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).rowcount
+            surplus = conn.execute(
+                "DELETE FROM user_contexts WHERE user_id IN ("
+                "SELECT user_id FROM user_contexts ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            ).rowcount
+        self.expirations += max(expired, 0)
+        self.evictions += max(surplus, 0)
+
+    def delete(self, user_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM user_contexts WHERE user_id = ?", (user_id,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM user_contexts").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "size": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisConnection:
+    """Minimal RESP client covering the commands the context store uses"""
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.db:
+            self._command("SELECT", self.db)
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = None
+        self._reader = None
+
+    def execute(self, *args):
+        """Send one command and return its decoded reply"""
+        try:
+            if self._sock is None:
+                self._connect()
+            return self._command(*args)
+        except OSError as e:
+            self.close()
+            raise ContextStoreError(f"Redis connection to {self.host}:{self.port} failed: {e}") from e
+
+    def _command(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise OSError("connection closed by server")
+
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise ContextStoreError(f"Redis error: {payload.decode('utf-8')}")
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise ContextStoreError(f"Unexpected Redis reply: {line!r}")
+
+
+class RedisContextStore(ContextStore):
+    """Contexts in Redis, shared by every worker that can reach the server"""
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None,
+                 ttl=DEFAULT_TTL_SECONDS, prefix="assistant:context:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._settings = dict(host=host, port=port, db=db, password=password)
+        self._local = threading.local()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _redis(self):
+        # A forked worker must not share its parent's socket
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = RedisConnection(**self._settings)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, user_id):
+        data = self._redis().execute("GET", self.prefix + user_id)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return UserContext.from_dict(json.loads(data))
+
+    def set(self, user_id, context):
+        # Redis enforces the TTL and, via maxmemory-policy, the size cap
+        args = ["SET", self.prefix + user_id, json.dumps(context.to_dict())]
+        if self.ttl:
+            args += ["EX", int(self.ttl)]
+        self._redis().execute(*args)
+
+    def delete(self, user_id):
+        self._redis().execute("DEL", self.prefix + user_id)
+
+    def __len__(self):
+        # Only this store's keys; the database may hold anything else too
+        conn = self._redis()
+        cursor, count = b"0", 0
+        while True:
+            cursor, keys = conn.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000)
+            count += len(keys)
+            if cursor == b"0":
+                return count
+
+    def stats(self):
+        server = {}
+        size = None
+        try:
+            info = self._redis().execute("INFO", "stats") or b""
+            for line in info.decode("utf-8").splitlines():
+                key, _, value = line.partition(":")
+                if key in ("evicted_keys", "expired_keys"):
+                    server[key] = int(value)
+            size = len(self)
+        except ContextStoreError as e:
+            logger.warning(f"Could not read Redis stats: {e}")
+
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            # None when Redis could not be reached
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": server.get("evicted_keys", 0),
+            "expirations": server.get("expired_keys", 0),
+        }
+
+
+def create_context_store(url=None, max_size=None, ttl=None):
+    """Build the context store described by url or the CONTEXT_STORE_URL setting"""
+    url = url or os.environ.get("CONTEXT_STORE_URL", "memory://")
+    max_size = max_size or int(os.environ.get("CONTEXT_MAX_USERS", DEFAULT_MAX_USERS))
+    ttl = ttl if ttl is not None else float(os.environ.get("CONTEXT_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryContextStore(max_size, ttl)
+    if parsed.scheme == "sqlite":
+        # Connections are opened per thread, and each would get its own
+        # private in-memory database, so a file is required
+        path = unquote(parsed.path)
+        if not path:
+            raise ValueError(f"{url} has no database file path; use memory:// for an in-process store")
+        return SQLiteContextStore(path, max_size, ttl)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        return RedisContextStore(
+            parsed.hostname or "localhost", parsed.port or 6379, db,
+            unquote(parsed.password) if parsed.password else None, ttl,
+        )
+    raise ValueError(f"Unsupported context store URL: {url}")
@@ -0,0 +1,208 @@
+"""Append-only conversation log.
+
+Every answered query becomes one JSON line: the query, intent, entities,
+response type, catalog version and stage timings. Request threads only put
+the event on a queue; a background thread batches queued events into one
+write, so logging adds no I/O to the request path. When the file passes
+max_bytes it is rotated to path.1, path.2, ... and, with compress set,
+gzipped.
+
+{worker} in the path stands for the worker's slot, a small number the
+server hands out (see gunicorn.conf.py) and gives again to the worker that
+replaces one, so recycled workers carry on with their predecessor's file
+and the number of files stays bounded. It is 0 outside a worker pool.
+
+Settings (environment variables):
+    CONVERSATION_LOG_PATH       log file; logging is off when unset. With
+                                several workers, put {worker} in the path so
+                                each writes its own file
+    CONVERSATION_LOG_MAX_BYTES  size at which the file is rotated
+    CONVERSATION_LOG_BACKUPS    rotated files kept
+    CONVERSATION_LOG_COMPRESS   gzip rotated files (default on)
+"""
+import atexit
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+
+import codec
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUPS = 10
+BATCH_SIZE = 256
+FLUSH_INTERVAL = 1.0
+QUEUE_SIZE = 100000
+
+_STOP = object()
+
+
+class ConversationLog:
+    """Buffered JSON Lines writer fed from a queue by a background thread"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS, compress=True,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.worker = None
+
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
+    def record(self, event):
+        """Queue an event for writing; never blocks the caller"""
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Losing a log line beats stalling a request
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            # Threads do not survive fork, so each worker starts its own writer
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self._queue.qsize():
+                self._queue = queue.Queue(self._queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        directory = os.path.dirname(self.current_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        stream = open(self.current_path, "ab")
+        try:
+            while True:
+                batch = [self._queue.get()]
+                stopping = batch[0] is _STOP
+                # Gather whatever else arrived, up to a batch, within the interval
+                while not stopping and len(batch) < self.batch_size:
+                    try:
+                        event = self._queue.get(timeout=self.flush_interval if len(batch) == 1 else 0)
+                    except queue.Empty:
+                        break
+                    if event is _STOP:
+                        stopping = True
+                        break
+                    batch.append(event)
+
+                events = [event for event in batch if event is not _STOP]
+                if events:
+                    stream.write(b"".join(codec.dumps(event) + b"\n" for event in events))
+                    stream.flush()
+                    self.written += len(events)
+                    if stream.tell() >= self.max_bytes:
+                        stream.close()
+                        self._rotate()
+                        stream = open(self.current_path, "ab")
+                if stopping:
+                    return
+        except Exception as e:
+            logger.error(f"Conversation log writer stopped: {e}")
+        finally:
+            stream.close()
+
+    def set_worker(self, slot):
+        """Name the slot that {worker} stands for; call before the first record"""
+        self.worker = slot
+
+    @property
+    def current_path(self):
+        return self.path.replace("{worker}", str(self.worker if self.worker is not None else 0))
+
+    def _rotated_name(self, number):
+        return f"{self.current_path}.{number}" + (".gz" if self.compress else "")
+
+    def _rotate(self):
+        """Shift path.N to path.N+1, dropping the oldest, and move the log to path.1"""
+        oldest = self._rotated_name(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._rotated_name(number)):
+                os.replace(self._rotated_name(number), self._rotated_name(number + 1))
+
+        if self.compress:
+            with open(self.current_path, "rb") as source, gzip.open(self._rotated_name(1), "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(self.current_path)
+        else:
+            os.replace(self.current_path, self._rotated_name(1))
+        self.rotations += 1
+
+    def close(self, timeout=5.0):
+        """Write everything queued so far and stop the writer"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        return {
+            "path": self.current_path,
+            "written": self.written,
+            "pending": self._queue.qsize(),
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+        }
+
+
+def create_conversation_log(path=None):
+    """Build the log named by path or CONVERSATION_LOG_PATH, or None if logging is off"""
+    path = path or os.environ.get("CONVERSATION_LOG_PATH")
+    if not path:
+        return None
+    log = ConversationLog(
+        path,
+        max_bytes=int(os.environ.get("CONVERSATION_LOG_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        backups=int(os.environ.get("CONVERSATION_LOG_BACKUPS", DEFAULT_BACKUPS)),
+        compress=os.environ.get("CONVERSATION_LOG_COMPRESS", "1").lower() in ("1", "true", "yes"),
+    )
+    atexit.register(log.close)
+    return log
+
+
+def read_events(path, on_error=None):
+    """Yield the events of a log file, plain or gzipped
+
+    A line that is not a JSON object, such as one torn by a crash, raises
+    codec.RequestError, unless on_error is given: it is then called with
+    the path, line number and error, and reading carries on.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                event = codec.loads(line)
+                if not isinstance(event, dict):
+                    raise codec.RequestError("Expected a JSON object")
+            except codec.RequestError as e:
+                if on_error is None:
+                    raise
+                on_error(path, number, e)
+                continue
+            yield event
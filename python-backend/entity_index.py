@@ -0,0 +1,179 @@
+"""Precompiled entity extraction and navigation lookup tables.
+
+Every pattern extract_entities looks for (intent patterns, categories,
+navigation shortcuts, section names and aliases) is normalized and compiled
+into one automaton at startup, so extraction finds its span in a single
+pass. Rebuild the index whenever intents or website_structure change.
+"""
+from intent_matcher import AhoCorasick
+
+# Trailing punctuation ignored when extracting entities
+TRAILING_PUNCTUATION = '.,!?;:'
+
+# Per intent, the pattern groups tried in order and how a hit becomes an
+# entity: "after" takes the text following the pattern, "value" the value
+# the pattern maps to
+RULES = {
+    "find_product": [
+        (("intent", "find_product"), "after", "product_query"),
+        ("category", "value", "product_query"),
+    ],
+    "add_to_cart": [
+        (("intent", "add_to_cart"), "after", "product_name"),
+        ("add", "after", "product_name"),
+    ],
+    "navigation": [
+        (("intent", "navigation"), "after", "destination"),
+        ("destination", "value", "destination"),
+    ],
+    "product_info": [
+        (("intent", "product_info"), "after", "product_name"),
+    ],
+    "section_inquiry": [
+        ("section", "value", "section"),
+        ("section_pattern", "value", "section"),
+    ],
+}
+
+
+class EntityIndex:
+    """Alias, destination and category maps compiled for one-pass extraction"""
+
+    def __init__(self, intents, website_structure, product_categories, direct_destinations, section_patterns):
+        patterns = {}
+
+        def register(group, entries):
+            # Rank keeps table order: within a group the first listed pattern wins
+            for rank, (pattern, value) in enumerate(entries):
+                pattern = pattern.lower()
+                if pattern:
+                    patterns.setdefault(pattern, []).append((group, rank, value))
+
+        for intent_name, intent_data in intents.items():
+            register(("intent", intent_name), [(p, None) for p in intent_data.get("patterns", [])])
+        register("category", [(category, category) for category in product_categories])
+        register("add", [("add", None)])
+        register("destination", list(direct_destinations.items()))
+        register("section", [
+            (name, section)
+            for section, section_data in website_structure.items()
+            for name in [section] + section_data["aliases"]
+        ])
+        register("section_pattern", [
+            (pattern, section)
+            for section, section_patterns in section_patterns.items()
+            for pattern in section_patterns
+        ])
+
+        self.automaton = AhoCorasick({pattern: tuple(entries) for pattern, entries in patterns.items()})
+        self.groups = {intent: {group for group, _, _ in rules} for intent, rules in RULES.items()}
+
+        # Exact section names and aliases for navigation; the first section listed wins
+        self.sections = {}
+        for section, section_data in website_structure.items():
+            for name in [section] + section_data["aliases"]:
+                self.sections.setdefault(name.lower(), section)
+
+    def _scan(self, text_lower, groups):
+        """Return the best hit per group and the start offsets of each hit pattern"""
+        best = {}
+        starts = {}
+        for start, pattern, entries in self.automaton.iter_matches(text_lower):
+            for group, rank, value in entries:
+                if group not in groups:
+                    continue
+                starts.setdefault(pattern, []).append(start)
+                current = best.get(group)
+                # Matches arrive in order, so a pattern's first occurrence is kept
+                if current is None or rank < current[0]:
+                    best[group] = (rank, pattern, value, start)
+        return best, starts
+
+    def extract(self, text, intent):
+        """Extract the entities for an intent from the text"""
+        rules = RULES.get(intent)
+        if not rules:
+            return {}
+
+        text_lower = text.lower().rstrip(TRAILING_PUNCTUATION)
+        best, starts = self._scan(text_lower, self.groups[intent])
+        return self._entities(rules, best, starts, text_lower)
+
+    def _entities(self, rules, best, starts, text_lower):
+        """Turn the best hits of a scan into entities, following an intent's rules"""
+        for group, kind, key in rules:
+            hit = best.get(group)
+            if hit is None:
+                continue
+
+            _, pattern, value, start = hit
+            if kind == "value":
+                return {key: value}
+
+            # Text up to the pattern's next non-overlapping occurrence, as str.split would give
+            end = start + len(pattern)
+            following = next((s for s in starts[pattern] if s >= end), len(text_lower))
+            return {key: text_lower[end:following].strip()}
+
+        return {}
+
+    def stream(self):
+        """Return an EntityStream for extracting entities while a query is still arriving"""
+        return EntityStream(self)
+
+    def resolve_section(self, destination):
+        """Return the website section a destination names exactly, or None"""
+        return self.sections.get(destination.lower())
+
+    def find_category(self, text):
+        """Return the first listed product category mentioned in text, or None"""
+        best, _ = self._scan(text.lower(), {"category"})
+        hit = best.get("category")
+        return hit[2] if hit else None
+
+
+class EntityStream:
+    """Entity extraction over a growing transcript
+
+    Every pattern group is scanned, since the intent the entities are for
+    may still change, and the automaton state is carried from one update to
+    the next as in IntentStream.
+    """
+
+    __slots__ = ("index", "text", "state", "best", "starts")
+
+    def __init__(self, index):
+        self.index = index
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        self.state = 0
+        self.best = {}
+        self.starts = {}
+
+    def update(self, text_lower):
+        """Advance to the full, already lower-cased transcript"""
+        if not text_lower.startswith(self.text):
+            self.reset()
+
+        offset = len(self.text)
+        self.state, matches = self.index.automaton.advance(text_lower[offset:], self.state, offset)
+        self.text = text_lower
+
+        best = self.best
+        for start, pattern, entries in matches:
+            self.starts.setdefault(pattern, []).append(start)
+            for group, rank, value in entries:
+                current = best.get(group)
+                if current is None or rank < current[0]:
+                    best[group] = (rank, pattern, value, start)
+
+    def extract(self, intent):
+        """Return the entities extract would give for the transcript so far"""
+        rules = RULES.get(intent)
+        if not rules:
+            return {}
+        # No pattern starts with trailing punctuation, so the hits are the
+        # same as after stripping it; only where an entity ends changes
+        return self.index._entities(rules, self.best, self.starts, self.text.rstrip(TRAILING_PUNCTUATION))
@@ -0,0 +1,8 @@
+// Export the storefront product data as the backend's catalog file.
+// Usage (from the repository root): node python-backend/export_catalog.mjs
+import { writeFileSync } from "fs"
+import { products } from "../lib/product-data.js"
+
+const target = new URL("./data/products.json", import.meta.url)
+writeFileSync(target, JSON.stringify(products, null, 2) + "\n")
+console.log(`Exported ${products.length} products to ${target.pathname}`)
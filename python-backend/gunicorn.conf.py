@@ -0,0 +1,98 @@
+"""Production launcher settings: a pre-forked pool of assistant workers.
+
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master, with the NLP data prewarmed, and
+the catalog, search index, intent matchers and any memory-mapped intent
+model built there as well. Workers are forked from it and share those pages
+copy-on-write; the garbage collector's generations are frozen before each
+fork so collections in a worker do not touch, and so copy, the shared heap.
+
+    kill -HUP <master>    replace every worker gracefully, e.g. after a config change
+    kill -USR2 <master>   start a new master running new code, then QUIT the old one
+
+Workers are recycled after GUNICORN_MAX_REQUESTS requests (with jitter, so
+they do not all restart together) to cap memory growth.
+
+Settings (environment variables):
+    PORT / GUNICORN_BIND          listen address, default 0.0.0.0:5000
+    WEB_CONCURRENCY               worker processes, defaults to the usable CPU count
+    GUNICORN_THREADS              threads per worker, default 1
+    GUNICORN_MAX_REQUESTS         requests before a worker is replaced, 0 to disable
+    GUNICORN_MAX_REQUESTS_JITTER  random extra requests per worker
+    GUNICORN_TIMEOUT              seconds before a silent worker is killed
+    CATALOG_JOURNAL_PATH          catalog syncs shared by the workers, default data/catalog_journal.db
+
+With more than one worker, set CONTEXT_STORE_URL to a sqlite:// or redis://
+store so every worker sees the same user contexts. Catalog syncs go through
+the journal: each worker applies the ones it missed on start and within
+CATALOG_POLL_SECONDS after, and recycled workers start from the newest
+checkpoint (CATALOG_CHECKPOINT_INTERVAL) rather than replaying them all.
+A conversation log (CONVERSATION_LOG_PATH) should contain {worker} so that
+each worker writes and rotates its own file. Workers are numbered by slot,
+from 0, and a replacement takes over the slot, and file, it replaces.
+"""
+import gc
+import os
+
+
+def _cpu_count():
+    # Respect CPU affinity and container limits where the platform exposes them
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Load NLTK data in the master, before the app import, so workers inherit it
+os.environ.setdefault("NLP_PREWARM", "1")
+# A sync reaches one worker; the journal carries it to the rest
+os.environ.setdefault(
+    "CATALOG_JOURNAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog_journal.db")
+)
+
+wsgi_app = "app:app"
+preload_app = True
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get("WEB_CONCURRENCY", _cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+
+def when_ready(server):
+    import app as backend
+
+    stats = backend.user_contexts.stats()
+    if workers > 1 and stats["backend"] == "memory":
+        server.log.warning(
+            "User contexts are held per worker; set CONTEXT_STORE_URL to share them across %d workers", workers
+        )
+    log_path = os.environ.get("CONVERSATION_LOG_PATH")
+    if workers > 1 and log_path and "{worker}" not in log_path:
+        server.log.warning("CONVERSATION_LOG_PATH has no {worker}; %d workers will share one file", workers)
+    server.log.info("Assistant preloaded in %s ms; starting %d workers", backend.startup_ms, workers)
+
+
+def pre_fork(server, worker):
+    # Lowest slot no live worker holds: a recycled worker's replacement gets
+    # its slot, while during a reload old and new workers hold distinct ones
+    taken = {getattr(live, "slot", None) for live in server.WORKERS.values()}
+    worker.slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+    # Move everything allocated so far out of the collector's reach
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app as backend
+
+    if backend.conversation_log is not None:
+        backend.conversation_log.set_worker(worker.slot)
+    # Forked from the master's catalog; catch up before serving
+    backend.refresh_catalog()
@@ -0,0 +1,313 @@
+"""Statistical intent classifier, an alternative to the rule matcher.
+
+Queries are reduced to hashed word unigram and bigram features, then scored
+by a linear softmax model. The model is trained offline from the intent
+pattern table, expanded with product names and section aliases, plus an
+optional labeled corpus. It is saved as one compact file that workers
+memory-map at startup, so every worker on a host shares the same pages.
+
+    python intent_classifier.py train --output data/intent_model.bin
+    python intent_classifier.py train --corpus data/intent_corpus.jsonl --epochs 300
+    python intent_classifier.py predict "show me my cart" "get a budget blender"
+
+The app selects the engine with INTENT_ENGINE ("rules" or "classifier").
+When the classifier is below its confidence threshold, the rule matcher
+answers instead. The rule matcher is also used when NumPy or the model
+file is missing.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import struct
+import sys
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from text_processing import normalize_text
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"INTC"
+FORMAT_VERSION = 1
+# The weight block starts at a multiple of this offset, so the mapped weights
+# begin on a 64-byte cache-line boundary
+ALIGNMENT = 64
+
+DEFAULT_FEATURES = 1 << 14
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_model.bin")
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_corpus.jsonl")
+
+
+def feature_ids(text, n_features):
+    """Return the sorted hashed unigram and bigram ids for text
+
+    Stop words are kept because phrases such as "show me" and "what can
+    you do" carry the intent. Words are not lemmatized, so the features do
+    not depend on which NLTK data is installed.
+    """
+    words = normalize_text(text).split()
+    grams = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return sorted({zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams})
+
+
+def _encode(texts, n_features):
+    """Flatten a batch of texts into feature ids, their row and row scale"""
+    ids, rows, scales = [], [], []
+    for row, text in enumerate(texts):
+        features = feature_ids(text, n_features)
+        ids.extend(features)
+        rows.extend([row] * len(features))
+        scales.append(1.0 / len(features) ** 0.5 if features else 0.0)
+    return (
+        np.asarray(ids, dtype=np.int64),
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(scales, dtype=np.float32),
+    )
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+class IntentClassifier:
+    """Linear softmax model over hashed bag-of-words features"""
+
+    def __init__(self, labels, weights, bias, threshold=DEFAULT_THRESHOLD):
+        self.labels = list(labels)
+        # weights is (n_features, n_labels); bias is (n_labels,)
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+
+    @property
+    def n_features(self):
+        return self.weights.shape[0]
+
+    def probabilities(self, texts):
+        """Return an (n_texts, n_labels) array of class probabilities"""
+        ids, rows, scales = _encode(texts, self.n_features)
+        scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        # One gather over the (possibly memory-mapped) weights for the whole batch
+        np.add.at(scores, rows, self.weights[ids])
+        scores *= scales[:, None]
+        scores += self.bias
+        return _softmax(scores)
+
+    def predict_batch(self, texts):
+        """Return (label, confidence) for each text"""
+        if not texts:
+            return []
+        probabilities = self.probabilities(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    @classmethod
+    def train(cls, examples, n_features=DEFAULT_FEATURES, epochs=200, learning_rate=0.5,
+              l2=1e-5, threshold=DEFAULT_THRESHOLD):
+        """Fit a model to (text, label) examples with full-batch gradient descent"""
+        labels = sorted({label for _, label in examples})
+        label_index = {label: i for i, label in enumerate(labels)}
+        texts = [text for text, _ in examples]
+        targets = np.array([label_index[label] for _, label in examples], dtype=np.int64)
+        ids, rows, scales = _encode(texts, n_features)
+        values = scales[rows]
+
+        weights = np.zeros((n_features, len(labels)), dtype=np.float32)
+        bias = np.zeros(len(labels), dtype=np.float32)
+        # Adagrad accumulators keep rare features learning as fast as common ones
+        weight_history = np.full_like(weights, 1e-8)
+        bias_history = np.full_like(bias, 1e-8)
+
+        for _ in range(epochs):
+            scores = np.zeros((len(texts), len(labels)), dtype=np.float32)
+            np.add.at(scores, rows, weights[ids] * values[:, None])
+            scores += bias
+            error = _softmax(scores)
+            error[np.arange(len(texts)), targets] -= 1.0
+            error /= len(texts)
+
+            weight_grad = np.zeros_like(weights)
+            np.add.at(weight_grad, ids, error[rows] * values[:, None])
+            weight_grad += l2 * weights
+            bias_grad = error.sum(axis=0)
+
+            weight_history += weight_grad ** 2
+            bias_history += bias_grad ** 2
+            weights -= learning_rate * weight_grad / np.sqrt(weight_history)
+            bias -= learning_rate * bias_grad / np.sqrt(bias_history)
+
+        return cls(labels, weights, bias, threshold)
+
+    def save(self, path):
+        """Write the model as a header followed by an aligned float32 weight block"""
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "labels": self.labels,
+            "n_features": self.n_features,
+            "threshold": self.threshold,
+        }).encode("utf-8")
+        prefix = len(MAGIC) + 4 + len(header)
+        padding = -prefix % ALIGNMENT
+        block = np.vstack([self.weights, self.bias[None, :]]).astype(np.float32)
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(b"\0" * padding)
+            f.write(block.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a model written by save"""
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an intent model file")
+            (header_size,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_size))
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported intent model version {header['version']} in {path}")
+
+        prefix = len(MAGIC) + 4 + header_size
+        offset = prefix + (-prefix % ALIGNMENT)
+        labels = header["labels"]
+        block = np.memmap(path, dtype=np.float32, mode="r", offset=offset,
+                          shape=(header["n_features"] + 1, len(labels)))
+        return cls(labels, block[:-1], np.array(block[-1]), header["threshold"])
+
+
+class ClassifierEngine:
+    """Intent engine answering from the classifier, or the rules when unsure"""
+
+    def __init__(self, classifier, fallback, threshold=None):
+        self.classifier = classifier
+        self.fallback = fallback
+        self.threshold = classifier.threshold if threshold is None else threshold
+
+    def detect(self, text_lower):
+        return self.detect_batch([text_lower])[0]
+
+    def detect_batch(self, texts_lower):
+        """Classify a batch of lower-cased texts in one pass over the model"""
+        return [
+            label if confidence >= self.threshold else self.fallback.detect(text)
+            for text, (label, confidence) in zip(texts_lower, self.classifier.predict_batch(texts_lower))
+        ]
+
+
+def load_engine(fallback, path=None, threshold=None):
+    """Return a ClassifierEngine over the model at path, or fallback if it cannot load"""
+    path = path or DEFAULT_MODEL_PATH
+    if np is None:
+        logger.warning("NumPy is not installed; using the rule-based intent matcher")
+        return fallback
+    try:
+        classifier = IntentClassifier.load(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load intent model {path} ({e}); using the rule-based intent matcher")
+        return fallback
+    logger.info(f"Loaded intent model {path} with {len(classifier.labels)} intents")
+    return ClassifierEngine(classifier, fallback, threshold)
+
+
+def synthetic_examples(intents, website_structure, product_categories, product_names, rng, per_pattern=20):
+    """Label the pattern table, filled out with products and sections, as training text"""
+    destinations = list(website_structure)
+    for section_data in website_structure.values():
+        destinations.extend(section_data["aliases"])
+    things = [name.lower() for name in product_names] + list(product_categories)
+
+    examples = []
+    for intent_name, intent_data in intents.items():
+        for pattern in intent_data.get("patterns", []):
+            examples.append((pattern, intent_name))
+            for _ in range(per_pattern):
+                if intent_name in ("navigation", "section_inquiry"):
+                    tail = rng.choice(["", "the ", "my "]) + rng.choice(destinations)
+                elif intent_name in ("find_product", "add_to_cart", "product_info"):
+                    tail = rng.choice(["", "a ", "the ", "some "]) + rng.choice(things)
+                else:
+                    tail = rng.choice(["", "please", "thanks", "now"])
+                examples.append((f"{pattern} {tail}".strip(), intent_name))
+
+    for category in product_categories:
+        examples.append((category, "find_product"))
+    return examples
+
+
+def read_corpus(path):
+    """Read (text, intent) pairs from a JSON Lines file"""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                examples.append((record["text"], record["intent"]))
+    return examples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or query the intent classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="train a model from the intent tables and a corpus")
+    train.add_argument("--output", default=DEFAULT_MODEL_PATH, help="model file to write")
+    train.add_argument("--corpus", help="labeled JSON Lines corpus with text and intent fields")
+    train.add_argument("--features", type=int, default=DEFAULT_FEATURES, help="hashed feature count")
+    train.add_argument("--epochs", type=int, default=200)
+    train.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="confidence below which the rule matcher answers")
+    train.add_argument("--seed", type=int, default=42)
+
+    predict = commands.add_parser("predict", help="classify queries with a trained model")
+    predict.add_argument("queries", nargs="+")
+    predict.add_argument("--model", default=DEFAULT_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    if np is None:
+        print("The intent classifier requires NumPy", file=sys.stderr)
+        return 1
+
+    if args.command == "predict":
+        classifier = IntentClassifier.load(args.model)
+        for query, (label, confidence) in zip(args.queries, classifier.predict_batch(args.queries)):
+            print(f"{label:<16} {confidence:.3f}  {query}")
+        return 0
+
+    import app as backend
+
+    rng = random.Random(args.seed)
+    examples = synthetic_examples(
+        backend.intents, backend.website_structure, backend.product_categories,
+        [product.name for product in backend.catalog.products], rng,
+    )
+    corpus_path = args.corpus or (DEFAULT_CORPUS_PATH if os.path.exists(DEFAULT_CORPUS_PATH) else None)
+    if corpus_path:
+        corpus = read_corpus(corpus_path)
+        # Hand-labeled examples outweigh the generated ones
+        examples.extend(corpus * 5)
+        print(f"Added {len(corpus)} labeled examples from {corpus_path}")
+
+    classifier = IntentClassifier.train(examples, args.features, args.epochs, threshold=args.threshold)
+    predictions = classifier.predict_batch([text for text, _ in examples])
+    accuracy = sum(label == expected for (label, _), (_, expected) in zip(predictions, examples)) / len(examples)
+    classifier.save(args.output)
+    print(f"Trained on {len(examples)} examples, {len(classifier.labels)} intents, "
+          f"training accuracy {accuracy:.3f}; wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Multi-pattern matching for intent detection.
+
+The intent, section and category tables are compiled once into a single
+Aho-Corasick automaton, so a query is scanned in one pass no matter how many
+patterns and aliases the tables hold.
+"""
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over literal string patterns"""
+
+    def __init__(self, patterns):
+        # patterns maps each literal pattern to the value reported when it matches
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for pattern, value in patterns.items():
+            if pattern:
+                self._add(pattern, value)
+
+        self._build_failure_links()
+
+    def _add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), pattern, value))
+
+    def _build_failure_links(self):
+        # Breadth-first so every state's failure target is finished before it
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Inherit the matches of the longest proper suffix
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def step(self, state, char):
+        """Advance the automaton by one character and return the new state"""
+        goto = self._goto
+        while state and char not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(char, 0)
+
+    def iter_matches(self, text, state=0, offset=0):
+        """Yield (start, pattern, value) for every pattern occurrence in text"""
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        for index, char in enumerate(text, offset):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, pattern, value in out[state]:
+                yield index - length + 1, pattern, value
+
+    def advance(self, text, state=0, offset=0):
+        """Scan text continuing from state; return the end state and the matches
+
+        offset is the position of text within the whole input, so a caller
+        feeding a growing input piece by piece gets the same match starts as
+        a single scan, including for patterns that straddle two pieces.
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        matches = []
+        for index, char in enumerate(text, offset):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, pattern, value in out[state]:
+                matches.append((index - length + 1, pattern, value))
+        return state, matches
+
+
+class IntentMatcher:
+    """Rule-based intent detection backed by one compiled automaton"""
+
+    INTENT = "intent"
+    SECTION_INQUIRY = "section_inquiry"
+    SECTION = "section"
+    CATEGORY = "category"
+
+    def __init__(self, intents, website_structure, product_categories, section_inquiry_patterns):
+        patterns = {}
+
+        def register(pattern, entry):
+            patterns.setdefault(pattern, []).append(entry)
+
+        # Rank keeps the table order so ties on position resolve as before
+        rank = 0
+        for intent_name, intent_data in intents.items():
+            for pattern in intent_data.get("patterns", []):
+                register(pattern, (self.INTENT, intent_name, rank))
+                rank += 1
+
+        for pattern in section_inquiry_patterns:
+            register(pattern, (self.SECTION_INQUIRY, None, 0))
+
+        for section, section_data in website_structure.items():
+            register(section, (self.SECTION, section, 0))
+            for alias in section_data["aliases"]:
+                register(alias, (self.SECTION, section, 0))
+
+        for category in product_categories:
+            register(category, (self.CATEGORY, category, 0))
+
+        self.automaton = AhoCorasick({pattern: tuple(entries) for pattern, entries in patterns.items()})
+
+    def detect(self, text_lower):
+        """Return the intent for already lower-cased text, or "unknown\""""
+        best = None
+        inquiry = section = category = False
+
+        for start, _, entries in self.automaton.iter_matches(text_lower):
+            for kind, name, rank in entries:
+                if kind == self.INTENT:
+                    # Earliest match wins, then the first pattern in table order
+                    if best is None or (start, rank) < best[0]:
+                        best = ((start, rank), name)
+                elif kind == self.SECTION_INQUIRY:
+                    inquiry = True
+                elif kind == self.SECTION:
+                    section = True
+                else:
+                    category = True
+
+        return self._decide(best, inquiry, section, category)
+
+    @staticmethod
+    def _decide(best, inquiry, section, category):
+        if best is not None:
+            return best[1]
+
+        if inquiry and section:
+            return "section_inquiry"
+
+        if category:
+            return "find_product"
+
+        return "unknown"
+
+    def detect_batch(self, texts_lower):
+        """Return the intent for each already lower-cased text"""
+        return [self.detect(text) for text in texts_lower]
+
+    def stream(self):
+        """Return an IntentStream for detecting intent while a query is still arriving"""
+        return IntentStream(self)
+
+
+class IntentStream:
+    """Intent detection over a growing transcript
+
+    Each update scans only the characters added since the last one, carrying
+    the automaton state across, so a transcript that grows word by word is
+    scanned once in total. If an update revises earlier text, as speech
+    recognizers do, the scan restarts. The intent after any update is the
+    one detect would give for the same text.
+    """
+
+    __slots__ = ("matcher", "text", "state", "best", "inquiry", "section", "category")
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        self.state = 0
+        self.best = None
+        self.inquiry = self.section = self.category = False
+
+    def update(self, text_lower):
+        """Advance to the full, already lower-cased transcript and return its intent"""
+        if not text_lower.startswith(self.text):
+            self.reset()
+
+        matcher = self.matcher
+        offset = len(self.text)
+        self.state, matches = matcher.automaton.advance(text_lower[offset:], self.state, offset)
+        self.text = text_lower
+
+        for start, _, entries in matches:
+            for kind, name, rank in entries:
+                if kind == matcher.INTENT:
+                    if self.best is None or (start, rank) < self.best[0]:
+                        self.best = ((start, rank), name)
+                elif kind == matcher.SECTION_INQUIRY:
+                    self.inquiry = True
+                elif kind == matcher.SECTION:
+                    self.section = True
+                else:
+                    self.category = True
+
+        return self.intent
+
+    @property
+    def intent(self):
+        return self.matcher._decide(self.best, self.inquiry, self.section, self.category)
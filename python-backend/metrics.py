@@ -0,0 +1,164 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are updated on the request path, so they are kept to
+a lock, a dict lookup and a bisect. Gauges are callbacks evaluated only when
+the metrics endpoint is scraped.
+"""
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from 10 microseconds to 5 seconds
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels"""
+
+    type = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def drain(self):
+        """Return the counts so far and start again from zero
+
+        A pool process hands its counts to the process serving the metrics
+        this way.
+        """
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        """Add counts returned by another process's drain()"""
+        for labels, amount in values.items():
+            self.inc(*labels, amount=amount)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._states.get(labels)
+            if state is None:
+                # Per-bucket counts plus an overflow slot, then sum and count
+                state = self._states[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            states = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._states.items()}
+        for labels, (counts, total, count) in sorted(states.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = (("le", _format_value(bound)),)
+                yield self.name + "_bucket", _format_labels(self.labelnames, labels, le), cumulative
+            yield self.name + "_sum", _format_labels(self.labelnames, labels), total
+            yield self.name + "_count", _format_labels(self.labelnames, labels), count
+
+
+class Gauge:
+    """Current value read from a callback at scrape time
+
+    The callback returns a number, or a dict mapping label value tuples to
+    numbers when the gauge has labels. None, for a value that cannot be read
+    right now, leaves the sample out.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, description, func, labelnames=()):
+        self.name = name
+        self.description = description
+        self.func = func
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.func()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, sample in sorted(value.items()):
+            if sample is None:
+                continue
+            yield self.name, _format_labels(self.labelnames, labels), sample
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, description, labelnames=()):
+        return self.register(Counter(name, description, labelnames))
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def gauge(self, name, description, func, labelnames=()):
+        return self.register(Gauge(name, description, func, labelnames))
+
+    def render(self):
+        """Return every metric in the Prometheus text format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
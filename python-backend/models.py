@@ -0,0 +1,106 @@
+"""Compact data model for products, cart items and per-user context.
+
+Slotted classes instead of dicts keep each instance to a handful of
+pointers, which matters with large catalogs and hundreds of thousands of
+active sessions per worker. Each type converts to and from the JSON shape
+used on the wire and by the shared context stores.
+"""
+from collections import deque
+
+# Conversation turns kept per user
+HISTORY_SIZE = 20
+
+
+class Product:
+    """A catalog product"""
+
+    __slots__ = ("id", "name", "price", "description", "category", "image", "rating", "reviews", "discount", "stock")
+
+    FIELDS = __slots__
+
+    def __init__(self, id, name, price, description="", category="", image=None,
+                 rating=None, reviews=0, discount=0, stock=0):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.description = description
+        self.category = category
+        self.image = image
+        self.rating = rating
+        self.reviews = reviews
+        self.discount = discount
+        self.stock = stock
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return f"Product(id={self.id!r}, name={self.name!r})"
+
+
+class CartItem:
+    """A line in the shopper's cart"""
+
+    __slots__ = ("id", "name", "price", "quantity", "discount")
+
+    def __init__(self, id, price, quantity=1, name=None, discount=0):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.discount = discount
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("id"),
+            float(data["price"]),
+            int(data.get("quantity", 1)),
+            data.get("name"),
+            float(data.get("discount") or 0),
+        )
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "price": self.price, "quantity": self.quantity,
+                "discount": self.discount}
+
+
+class UserContext:
+    """What the assistant remembers about one user between queries"""
+
+    __slots__ = ("last_product_ids", "last_intent", "sentiment", "history")
+
+    def __init__(self, last_product_ids=(), last_intent=None, sentiment="neutral", history=None):
+        # Only ids are kept; products are looked up in the catalog when needed
+        self.last_product_ids = list(last_product_ids)
+        self.last_intent = last_intent
+        self.sentiment = sentiment
+        # Allocated on first use, since most users never need it
+        self.history = deque(history, maxlen=HISTORY_SIZE) if history else None
+
+    def remember(self, entry):
+        """Append an entry to the bounded conversation history"""
+        if self.history is None:
+            self.history = deque(maxlen=HISTORY_SIZE)
+        self.history.append(entry)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("last_product_ids", ()),
+            data.get("last_intent"),
+            data.get("sentiment", "neutral"),
+            data.get("history"),
+        )
+
+    def to_dict(self):
+        return {
+            "last_product_ids": self.last_product_ids,
+            "last_intent": self.last_intent,
+            "sentiment": self.sentiment,
+            "history": list(self.history) if self.history else [],
+        }
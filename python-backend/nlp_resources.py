@@ -0,0 +1,191 @@
+"""Lazy, offline loading of the NLTK components used by the assistant.
+
+Nothing here touches the network unless NLTK_ALLOW_DOWNLOAD is set (or
+download() is called explicitly), and each component is only built the first
+time it is needed. Missing data degrades gracefully instead of failing
+startup: tokenizing falls back to a regex, lemmatizing to the identity,
+stopword filtering to no filtering and sentiment to neutral.
+
+Fetch the data once on a connected host with:
+
+    python nlp_resources.py --download
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# NLTK package name -> data paths that satisfy it (newer NLTK releases use punkt_tab)
+RESOURCES = {
+    "punkt": ["tokenizers/punkt_tab/english/", "tokenizers/punkt"],
+    "stopwords": ["corpora/stopwords"],
+    "wordnet": ["corpora/wordnet"],
+    "vader_lexicon": ["sentiment/vader_lexicon.zip", "sentiment/vader_lexicon"],
+}
+
+FALLBACK_TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)?|[^\w\s]")
+
+_lock = threading.RLock()
+_components = {}
+_available = {}
+_load_times = {}
+
+
+def downloads_allowed():
+    """Whether missing NLTK data may be fetched from the network"""
+    return os.environ.get("NLTK_ALLOW_DOWNLOAD", "").lower() in ("1", "true", "yes")
+
+
+def has_resource(name):
+    """Check for local NLTK data, downloading it only if explicitly allowed"""
+    with _lock:
+        if name in _available:
+            return _available[name]
+
+        import nltk
+
+        def find():
+            for path in RESOURCES[name]:
+                try:
+                    nltk.data.find(path)
+                    return True
+                except LookupError:
+                    continue
+            return False
+
+        found = find()
+        if not found and downloads_allowed():
+            logger.info(f"Downloading NLTK resource {name}")
+            found = nltk.download(name, quiet=True) and find()
+        if not found:
+            logger.warning(f"NLTK resource {name} is not installed locally; using a fallback")
+
+        _available[name] = found
+        return found
+
+
+def _component(key, build):
+    # Build each component once; later calls return the cached instance
+    component = _components.get(key)
+    if component is None:
+        with _lock:
+            component = _components.get(key)
+            if component is None:
+                start = time.perf_counter()
+                component = build()
+                _load_times[key] = round((time.perf_counter() - start) * 1000, 2)
+                _components[key] = component
+    return component
+
+
+class _IdentityLemmatizer:
+    """Stand-in used when WordNet data is unavailable"""
+
+    def lemmatize(self, word, pos="n"):
+        return word
+
+
+def _build_lemmatizer():
+    if not has_resource("wordnet"):
+        return _IdentityLemmatizer()
+    from nltk.stem import WordNetLemmatizer
+
+    lemmatizer = WordNetLemmatizer()
+    # WordNet is itself lazily loaded; pay that cost now rather than mid-request
+    lemmatizer.lemmatize("warmup")
+    return lemmatizer
+
+
+def _build_stop_words():
+    if not has_resource("stopwords"):
+        return frozenset()
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("english"))
+
+
+def _build_sentiment_analyzer():
+    if not has_resource("vader_lexicon"):
+        return False
+    from nltk.sentiment import SentimentIntensityAnalyzer
+
+    return SentimentIntensityAnalyzer()
+
+
+def _build_tokenizer():
+    if not has_resource("punkt"):
+        return FALLBACK_TOKEN_PATTERN.findall
+    from nltk.tokenize import word_tokenize
+
+    word_tokenize("warm up")
+    return word_tokenize
+
+
+def get_lemmatizer():
+    """Return the shared WordNet lemmatizer"""
+    return _component("lemmatizer", _build_lemmatizer)
+
+
+def get_stop_words():
+    """Return the English stopword set"""
+    return _component("stop_words", _build_stop_words)
+
+
+def get_sentiment_analyzer():
+    """Return the VADER analyzer, or None when its lexicon is unavailable"""
+    return _component("sentiment_analyzer", _build_sentiment_analyzer) or None
+
+
+def tokenize(text):
+    """Split text into word tokens"""
+    return _component("tokenizer", _build_tokenizer)(text)
+
+
+def prewarm():
+    """Load every component now, e.g. in a parent process before forking workers"""
+    get_lemmatizer()
+    get_stop_words()
+    get_sentiment_analyzer()
+    tokenize("")
+    return status()
+
+
+def status():
+    """Return which resources are available and how long each component took to load"""
+    return {
+        "downloads_allowed": downloads_allowed(),
+        "resources": dict(_available),
+        "load_ms": dict(_load_times),
+    }
+
+
+def download(names=None):
+    """Fetch NLTK data from the network; the only code path that always does"""
+    import nltk
+
+    results = {}
+    for name in names or RESOURCES:
+        results[name] = nltk.download(name, quiet=True)
+        if name == "punkt":
+            # word_tokenize in newer NLTK releases reads punkt_tab instead
+            nltk.download("punkt_tab", quiet=True)
+    with _lock:
+        _available.clear()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect or fetch the assistant's NLTK data")
+    parser.add_argument("--download", action="store_true", help="download missing NLTK resources")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.download:
+        print(json.dumps(download(), indent=2))
+    print(json.dumps(prewarm(), indent=2))
@@ -0,0 +1,58 @@
+"""Lazily evaluated, individually timed request pipeline.
+
+Each stage is a function of the run that produced it. A stage only executes
+when something asks for its value, so a request never pays for work no later
+stage needs, and every stage that did run reports its own time.
+"""
+import time
+
+
+class Pipeline:
+    """Registry of named stages"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name):
+        """Register the decorated function as the stage producing name"""
+        def register(func):
+            self.stages[name] = func
+            return func
+        return register
+
+    def run(self, **inputs):
+        """Start a run seeded with input values; stages execute on demand"""
+        return PipelineRun(self, inputs)
+
+
+class PipelineRun:
+    """Values and timings for one pass through a pipeline"""
+
+    def __init__(self, pipeline, inputs):
+        self.pipeline = pipeline
+        self.values = dict(inputs)
+        self.timings = {}
+        self._nested = 0.0
+
+    def __getitem__(self, name):
+        if name in self.values:
+            return self.values[name]
+
+        func = self.pipeline.stages[name]
+
+        # Time the stage exclusive of any stages it pulls in itself
+        outer_nested = self._nested
+        self._nested = 0.0
+        started = time.perf_counter()
+        try:
+            value = func(self)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = round((elapsed - self._nested) * 1000, 3)
+            self._nested = outer_nested + elapsed
+
+        self.values[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self.values
@@ -0,0 +1,107 @@
+"""Cart pricing: discounts, totals and free-shipping eligibility.
+
+Carts are priced a column at a time. With NumPy installed, prices,
+quantities and discounts are copied into arrays once and reduced
+together, which keeps carts with thousands of lines and multi-cart
+quotes fast. Without NumPy, the same arithmetic runs as one Python loop.
+Both paths give the same results, which match the front end's
+getCartTotal.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Matches the threshold quoted in the shipping_info responses
+FREE_SHIPPING_THRESHOLD = 50.0
+
+# Below this many lines, building arrays costs more than it saves
+VECTOR_MIN_LINES = 64
+
+BACKEND = "numpy" if np is not None else "python"
+
+
+def discounted_price(price, discount):
+    """Unit price after a percentage discount"""
+    return price * (1 - discount / 100) if discount else price
+
+
+class CartSummary:
+    """Totals for one cart"""
+
+    __slots__ = ("item_count", "line_count", "subtotal", "savings", "total")
+
+    def __init__(self, item_count=0, line_count=0, subtotal=0.0, savings=0.0, total=0.0):
+        self.item_count = item_count
+        self.line_count = line_count
+        self.subtotal = subtotal
+        self.savings = savings
+        self.total = total
+
+    @property
+    def free_shipping(self):
+        return self.total >= FREE_SHIPPING_THRESHOLD
+
+    def to_dict(self):
+        return {
+            "item_count": self.item_count,
+            "line_count": self.line_count,
+            "subtotal": round(self.subtotal, 2),
+            "savings": round(self.savings, 2),
+            "total": round(self.total, 2),
+            "free_shipping": self.free_shipping,
+            "amount_to_free_shipping": round(max(FREE_SHIPPING_THRESHOLD - self.total, 0.0), 2),
+        }
+
+
+def _summarize_loop(items):
+    item_count = 0
+    subtotal = 0.0
+    total = 0.0
+    for item in items:
+        quantity = item.quantity
+        line = item.price * quantity
+        item_count += quantity
+        subtotal += line
+        total += line * (1 - item.discount / 100) if item.discount else line
+    return CartSummary(item_count, len(items), subtotal, subtotal - total, total)
+
+
+def _columns(items):
+    count = len(items)
+    prices = np.fromiter((item.price for item in items), dtype=np.float64, count=count)
+    quantities = np.fromiter((item.quantity for item in items), dtype=np.int64, count=count)
+    discounts = np.fromiter((item.discount or 0 for item in items), dtype=np.float64, count=count)
+    lines = prices * quantities
+    return quantities, lines, lines * (1 - discounts / 100)
+
+
+def summarize_cart(items):
+    """Return the CartSummary for a list of CartItems"""
+    if np is None or len(items) < VECTOR_MIN_LINES:
+        return _summarize_loop(items)
+    quantities, lines, discounted = _columns(items)
+    subtotal = float(lines.sum())
+    total = float(discounted.sum())
+    return CartSummary(int(quantities.sum()), len(items), subtotal, subtotal - total, total)
+
+
+def summarize_carts(carts):
+    """Return a CartSummary per cart, pricing every line of every cart together"""
+    line_total = sum(len(items) for items in carts)
+    if np is None or line_total < VECTOR_MIN_LINES:
+        return [_summarize_loop(items) for items in carts]
+
+    items = [item for cart in carts for item in cart]
+    quantities, lines, discounted = _columns(items)
+    # Cart number of each line, so one bincount per column gives every cart's sum
+    owners = np.repeat(np.arange(len(carts)), [len(cart) for cart in carts])
+    item_counts = np.bincount(owners, weights=quantities, minlength=len(carts))
+    subtotals = np.bincount(owners, weights=lines, minlength=len(carts))
+    totals = np.bincount(owners, weights=discounted, minlength=len(carts))
+
+    return [
+        CartSummary(int(item_counts[i]), len(cart), float(subtotals[i]),
+                    float(subtotals[i] - totals[i]), float(totals[i]))
+        for i, cart in enumerate(carts)
+    ]
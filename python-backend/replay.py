@@ -0,0 +1,282 @@
+"""Replay recorded assistant requests through the pipeline, offline.
+
+Reads JSON Lines files of /api/assistant request bodies (plain or
+gzipped; conversation log files work too) and runs each one in-process
+through detect_intent, extract_entities and get_response, timing every
+stage. Prints a per-intent latency breakdown and can write a cProfile
+profile, save the results, and diff intents and response types against
+an earlier run.
+
+    python replay.py requests.jsonl --output replay.json
+    python replay.py requests.jsonl --workers 4 --profile replay.prof
+    python replay.py requests.jsonl --baseline replay.json
+
+With --workers, requests are split across processes by user id, so each
+user's turns still run in order against one context store. The profile is
+the merged pstats file of every process; open it with pstats, snakeviz,
+or flameprof for a flame graph.
+
+With --baseline, every request whose intent or response type differs from
+the baseline run is reported and the exit status is 1.
+"""
+import argparse
+import cProfile
+import json
+import logging
+import multiprocessing
+import platform
+import pstats
+import sys
+import time
+import zlib
+from datetime import datetime
+
+import app as backend
+import codec
+from benchmark import percentile
+from context_store import create_context_store
+from conversation_log import read_events
+
+STAGES = ("detect", "entities", "response")
+
+
+def read_requests(paths):
+    """Return (requests, skipped) from JSON Lines files of request bodies"""
+    requests, skipped = [], 0
+
+    def malformed(path, number, error):
+        nonlocal skipped
+        skipped += 1
+
+    for path in paths:
+        for body in read_events(path, malformed):
+            try:
+                request = codec.AssistantRequest.from_dict(body)
+            except codec.RequestError:
+                skipped += 1
+                continue
+            if request.query:
+                requests.append(request)
+            else:
+                skipped += 1
+    return requests, skipped
+
+
+def replay_one(index, request, catalogs):
+    """Run one request through the pipeline stages, timing each"""
+    # Clients that post their product list usually post the same one again
+    key = codec.dumps(request.products) if request.products else None
+    catalog = catalogs.get(key)
+    if catalog is None:
+        catalog = catalogs[key] = backend.resolve_catalog(request.products)
+
+    started = time.perf_counter()
+    intent = backend.detect_intent(request.query)
+    detected = time.perf_counter()
+    entities = (
+        backend.extract_entities(request.query, intent) if intent in backend.ENTITY_INTENTS else {}
+    )
+    extracted = time.perf_counter()
+    sentiment = backend.analyze_sentiment(request.query) if backend.SENTIMENT_ENABLED else None
+    response = backend.get_response(
+        intent, entities, request.user_id, catalog, request.cart, sentiment
+    )
+    finished = time.perf_counter()
+
+    return {
+        "index": index,
+        "query": request.query,
+        "user_id": request.user_id,
+        "intent": intent,
+        "response_type": response.get("type", "unknown"),
+        "detect_ms": round((detected - started) * 1000, 4),
+        "entities_ms": round((extracted - detected) * 1000, 4),
+        "response_ms": round((finished - extracted) * 1000, 4),
+        "total_ms": round((finished - started) * 1000, 4),
+    }
+
+
+class _Snapshot:
+    """Raw profiler stats in the shape pstats.Stats loads from"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def replay_shard(shard, profile=False):
+    """Replay (index, request) pairs in order; return results and raw profile stats"""
+    # Replays never touch the configured store, and always start from empty contexts
+    backend.user_contexts = create_context_store("memory://")
+    catalogs = {}
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    results = [replay_one(index, request, catalogs) for index, request in shard]
+    if profiler is None:
+        return results, None
+    profiler.disable()
+    profiler.create_stats()
+    return results, profiler.stats
+
+
+def _replay_shard_args(args):
+    return replay_shard(*args)
+
+
+def shard_requests(requests, count):
+    """Split requests into count shards, keeping each user's requests together and in order"""
+    shards = [[] for _ in range(count)]
+    for index, request in enumerate(requests):
+        shards[zlib.crc32(request.user_id.encode("utf-8")) % count].append((index, request))
+    return [shard for shard in shards if shard]
+
+
+def run(requests, workers=1, profile=False):
+    """Replay every request; return results in input order and the merged profile"""
+    if workers <= 1:
+        results, stats = replay_shard(list(enumerate(requests)), profile)
+        outputs = [(results, stats)]
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        # Forked workers inherit the loaded app instead of importing it again
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        shards = shard_requests(requests, workers)
+        with context.Pool(len(shards)) as pool:
+            outputs = pool.map(_replay_shard_args, [(shard, profile) for shard in shards])
+
+    results = sorted((result for shard_results, _ in outputs for result in shard_results),
+                     key=lambda result: result["index"])
+    merged = None
+    if profile:
+        merged = pstats.Stats(_Snapshot(outputs[0][1]))
+        for _, stats in outputs[1:]:
+            merged.add(_Snapshot(stats))
+    return results, merged
+
+
+def summarize(results):
+    """Return overall and per-intent latency percentiles and stage means"""
+    by_intent = {}
+    for result in results:
+        by_intent.setdefault(result["intent"], []).append(result)
+
+    def breakdown(group):
+        totals = sorted(result["total_ms"] for result in group)
+        summary = {
+            "count": len(group),
+            "p50_ms": percentile(totals, 0.50),
+            "p95_ms": percentile(totals, 0.95),
+            "p99_ms": percentile(totals, 0.99),
+        }
+        for stage in STAGES:
+            summary[f"mean_{stage}_ms"] = round(sum(r[f"{stage}_ms"] for r in group) / len(group), 4)
+        return summary
+
+    return {
+        "overall": breakdown(results) if results else None,
+        "intents": {intent: breakdown(group) for intent, group in sorted(by_intent.items())},
+    }
+
+
+def diff(results, baseline):
+    """Return (index, query, field, before, after) for every changed intent or response type"""
+    previous = {record["index"]: record for record in baseline.get("results", [])}
+    changes = []
+    for result in results:
+        before = previous.get(result["index"])
+        if before is None or before["query"] != result["query"]:
+            continue
+        for field in ("intent", "response_type"):
+            if before[field] != result[field]:
+                changes.append((result["index"], result["query"], field, before[field], result[field]))
+    return changes
+
+
+def print_summary(summary):
+    print(f"{'intent':<18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  "
+          + "  ".join(f"{stage + ' ms':>11}" for stage in STAGES))
+    rows = list(summary["intents"].items())
+    if summary["overall"]:
+        rows.append(("(all)", summary["overall"]))
+    for intent, stats in rows:
+        print(f"{intent:<18} {stats['count']:>7} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+              f"{stats['p99_ms']:>9.3f}  " + "  ".join(f"{stats[f'mean_{stage}_ms']:>11.4f}" for stage in STAGES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded assistant requests through the pipeline")
+    parser.add_argument("inputs", nargs="+", help="JSON Lines files of request bodies, optionally gzipped")
+    parser.add_argument("--workers", type=int, default=1, help="processes to replay with")
+    parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    parser.add_argument("--profile", help="write a cProfile (pstats) profile to this file")
+    parser.add_argument("--top", type=int, default=25, help="functions to list from the profile")
+    parser.add_argument("--output", help="write the summary and per-request results as JSON to this file")
+    parser.add_argument("--baseline", help="diff intents and response types against an earlier --output file")
+    parser.add_argument("--show", type=int, default=20, help="differences to list from the baseline diff")
+    args = parser.parse_args(argv)
+
+    # Per-request INFO logging would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    requests, skipped = read_requests(args.inputs)
+    if args.limit is not None:
+        requests = requests[:args.limit]
+    if not requests:
+        print("No requests to replay", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    results, profile = run(requests, args.workers, bool(args.profile))
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(results)
+    print(f"Replayed {len(results)} requests ({skipped} skipped) with {max(args.workers, 1)} "
+          f"worker(s) in {elapsed:.2f}s, {len(results) / elapsed:.1f}/s")
+    print_summary(summary)
+
+    if profile is not None:
+        profile.dump_stats(args.profile)
+        print(f"\nProfile written to {args.profile}")
+        profile.sort_stats("cumulative").print_stats(args.top)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "inputs": args.inputs,
+                "workers": args.workers,
+                "profiled": bool(args.profile),
+                "intent_engine": type(backend.intent_engine).__name__,
+                "catalog_version": backend.current_catalog().version,
+                "summary": summary,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changes = diff(results, baseline)
+        if baseline.get("profiled", False) != bool(args.profile):
+            print("Only one of the runs was profiled, so the latencies are not comparable")
+        previous = baseline.get("summary", {}).get("intents", {})
+        for intent, stats in summary["intents"].items():
+            before = previous.get(intent)
+            if before and before["p95_ms"]:
+                print(f"{intent:<18} p95 {before['p95_ms']:.3f}ms -> {stats['p95_ms']:.3f}ms "
+                      f"({stats['p95_ms'] / before['p95_ms'] - 1.0:+.0%})")
+        for index, query, field, before, after in changes[:args.show]:
+            print(f"CHANGED #{index} {field}: {before} -> {after}  {query!r}")
+        if changes:
+            print(f"{len(changes)} requests answered differently from the baseline")
+            return 1
+        print("Intents and response types match the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""Ranked, typo-tolerant product search.
+
+Products are indexed once into BM25 postings over lemmatized tokens, with
+each posting's term-frequency/length factor precomputed so a query only sums
+impacts. Query terms missing from the vocabulary are expanded through a
+character trigram index, so speech-to-text typos, plurals and partial words
+still find their products.
+
+Queries over short posting lists score every posting. Over long ones, the
+top results come from walking impact-ordered copies of the lists in step
+and stopping once no unseen product can outscore them (Fagin's threshold
+algorithm), and the number of matches is counted with set intersections
+rather than by visiting each posting.
+
+An index can be copied cheaply and the copy updated product by product:
+the copy shares every posting list and trigram set with the original until
+it changes one, so the original can keep serving queries meanwhile.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+import nlp_resources
+from text_processing import lemmatize
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Field weights for each index view; "name" answers lookups by product name
+VIEWS = {
+    "all": {"name": 3.0, "category": 2.0, "description": 1.0},
+    "name": {"name": 1.0},
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Fuzzy expansion: minimum similarity kept, score for prefix matches, and
+# how many vocabulary terms one query term may expand to
+MIN_SIMILARITY = 0.6
+PREFIX_SIMILARITY = 0.8
+MAX_EXPANSIONS = 8
+EXPANSION_CACHE_SIZE = 4096
+
+# Queries touching at most this many postings are scored exhaustively
+EXHAUSTIVE_MAX_POSTINGS = 2048
+# Longest query whose matches are counted by set intersections
+MAX_COUNTED_TERMS = 6
+
+
+def trigrams(term):
+    """Return the padded character trigrams of a term"""
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def analyze(text):
+    """Tokenize, drop stopwords and lemmatize text into index terms"""
+    stop_words = nlp_resources.get_stop_words()
+    return [
+        lemmatize(token)
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in stop_words
+    ]
+
+
+class _View:
+    """BM25 impact postings for one weighting of the product fields"""
+
+    def __init__(self, weights):
+        self.weights = weights
+        self.postings = {}
+        # Terms whose posting dict belongs to this view rather than to the
+        # view it was copied from
+        self.owned = set()
+        # Term -> (documents by descending impact, their impacts), built on demand
+        self.ranked_postings = {}
+        self.doc_count = 0
+        # Length normalization uses the average at build time so that
+        # adding a document never rewrites the impacts already stored
+        self.reference_length = 1.0
+
+    def copy(self):
+        view = _View(self.weights)
+        view.postings = dict(self.postings)
+        view.ranked_postings = dict(self.ranked_postings)
+        view.doc_count = self.doc_count
+        view.reference_length = self.reference_length
+        return view
+
+    def _writable(self, term):
+        self.ranked_postings.pop(term, None)
+        postings = self.postings.get(term)
+        if postings is None or term not in self.owned:
+            postings = self.postings[term] = dict(postings) if postings else {}
+            self.owned.add(term)
+        return postings
+
+    def ranked(self, term):
+        """Return the documents containing term, highest impact first, and their impacts
+
+        Equal impacts stay in document order, which is the ranking's tie-break.
+        """
+        ranked = self.ranked_postings.get(term)
+        if ranked is None:
+            postings = self.postings[term]
+            docs = sorted(sorted(postings), key=postings.__getitem__, reverse=True)
+            ranked = self.ranked_postings[term] = (docs, [postings[doc] for doc in docs])
+        return ranked
+
+    def term_frequencies(self, fields):
+        counts = Counter()
+        for field, weight in self.weights.items():
+            for term in fields[field]:
+                counts[term] += weight
+        return counts
+
+    def add(self, doc, counts):
+        norm = K1 * (1.0 - B + B * sum(counts.values()) / self.reference_length)
+        for term, tf in counts.items():
+            self._writable(term)[doc] = tf * (K1 + 1.0) / (tf + norm)
+        self.doc_count += 1
+
+    def remove(self, doc, counts):
+        for term in counts:
+            postings = self._writable(term)
+            postings.pop(doc, None)
+            if not postings:
+                del self.postings[term]
+                self.owned.discard(term)
+        self.doc_count -= 1
+
+
+class ProductSearchIndex:
+    """BM25 index with trigram-based fuzzy term expansion"""
+
+    def __init__(self, products):
+        self.views = {name: _View(weights) for name, weights in VIEWS.items()}
+        self.vocabulary = {}
+        self.gram_index = {}
+        self._owned_grams = set()
+        self._expansions = {}
+
+        # A None slot (a deleted product) keeps its document number unused
+        analyzed = [(doc, self._analyze_fields(product)) for doc, product in enumerate(products) if product is not None]
+        for view in self.views.values():
+            counts = [(doc, view.term_frequencies(fields)) for doc, fields in analyzed]
+            if counts:
+                view.reference_length = sum(sum(c.values()) for _, c in counts) / len(counts) or 1.0
+            for doc, doc_counts in counts:
+                view.add(doc, doc_counts)
+        for _, fields in analyzed:
+            self._add_vocabulary(fields)
+
+    def _analyze_fields(self, product):
+        return {
+            "name": analyze(product.name),
+            "category": analyze(product.category),
+            "description": analyze(product.description),
+        }
+
+    def copy(self):
+        """Return an index sharing this one's postings until either is updated"""
+        clone = ProductSearchIndex([])
+        clone.views = {name: view.copy() for name, view in self.views.items()}
+        clone.vocabulary = dict(self.vocabulary)
+        clone.gram_index = dict(self.gram_index)
+        return clone
+
+    def add(self, doc, product):
+        """Index a product under the document number doc"""
+        fields = self._analyze_fields(product)
+        for view in self.views.values():
+            view.add(doc, view.term_frequencies(fields))
+        self._add_vocabulary(fields)
+
+    def remove(self, doc, product):
+        """Unindex the product stored under the document number doc"""
+        fields = self._analyze_fields(product)
+        for view in self.views.values():
+            view.remove(doc, view.term_frequencies(fields))
+
+        # The "all" view covers every field, so a term gone from it is gone
+        # from the catalog and should no longer attract fuzzy matches
+        postings = self.views["all"].postings
+        for term in {term for terms in fields.values() for term in terms}:
+            if term not in postings and term in self.vocabulary:
+                del self.vocabulary[term]
+                for gram in trigrams(term):
+                    self._gram_set(gram).discard(term)
+        self._expansions.clear()
+
+    def _gram_set(self, gram):
+        terms = self.gram_index.get(gram)
+        if terms is None or gram not in self._owned_grams:
+            terms = self.gram_index[gram] = set(terms) if terms else set()
+            self._owned_grams.add(gram)
+        return terms
+
+    def _add_vocabulary(self, fields):
+        for terms in fields.values():
+            for term in terms:
+                if term not in self.vocabulary:
+                    grams = trigrams(term)
+                    self.vocabulary[term] = len(grams)
+                    for gram in grams:
+                        self._gram_set(gram).add(term)
+        self._expansions.clear()
+
+    def expand(self, term):
+        """Return (vocabulary term, similarity) pairs a query term may match"""
+        cached = self._expansions.get(term)
+        if cached is not None:
+            return cached
+
+        matches = []
+        if term in self.vocabulary:
+            # Known terms match exactly; only unknown ones are treated as typos
+            matches.append((term, 1.0))
+        elif len(term) >= 3:
+            grams = trigrams(term)
+            overlaps = Counter()
+            for gram in grams:
+                overlaps.update(self.gram_index.get(gram, ()))
+
+            fuzzy = []
+            for candidate, overlap in overlaps.items():
+                if candidate == term:
+                    continue
+                if candidate.startswith(term) or (term.startswith(candidate) and len(term) - len(candidate) <= 2):
+                    # Partial words and simple plurals
+                    similarity = PREFIX_SIMILARITY
+                else:
+                    # Dice coefficient over trigram sets
+                    similarity = 2.0 * overlap / (len(grams) + self.vocabulary[candidate])
+                if similarity >= MIN_SIMILARITY:
+                    fuzzy.append((candidate, similarity))
+            matches.extend(heapq.nlargest(MAX_EXPANSIONS, fuzzy, key=lambda match: match[1]))
+
+        if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+            self._expansions.clear()
+        self._expansions[term] = matches
+        return matches
+
+    def search(self, query, limit=3, view="all", min_coverage=0.5):
+        """Return (number of matches, top documents) for a query
+
+        A document matches when the query terms it contains, weighted by how
+        closely they matched, cover at least min_coverage of the query.
+        Documents are ranked by score, ties in catalog order.
+        """
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms:
+            return 0, []
+
+        index = self.views[view]
+        total_docs = index.doc_count
+        # Per query term, (candidate, similarity, weight, postings) for each expansion
+        expanded = []
+        for term in terms:
+            lists = []
+            for candidate, similarity in self.expand(term):
+                postings = index.postings.get(candidate)
+                if not postings:
+                    continue
+                df = len(postings)
+                weight = similarity * math.log(1.0 + (total_docs - df + 0.5) / (df + 0.5))
+                lists.append((candidate, similarity, weight, postings))
+            expanded.append(lists)
+
+        required = min_coverage * len(terms)
+        # The shortcuts need one similarity per query term, so that a
+        # document's coverage depends only on which terms it contains
+        uniform = all(len({similarity for _, similarity, _, _ in lists}) <= 1 for lists in expanded)
+        size = sum(len(postings) for lists in expanded for _, _, _, postings in lists)
+        if size <= EXHAUSTIVE_MAX_POSTINGS or not uniform or len(terms) > MAX_COUNTED_TERMS:
+            return self._score_all(expanded, required, limit)
+        return self._count_matches(expanded, required), self._top_documents(index, expanded, required, limit)
+
+    def _score_all(self, expanded, required, limit):
+        """Score every posting of every expansion"""
+        scores = {}
+        coverage = Counter()
+        for lists in expanded:
+            for _, _, weight, postings in lists:
+                score = scores.get
+                for doc, impact in postings.items():
+                    scores[doc] = score(doc, 0.0) + weight * impact
+            if len(lists) == 1:
+                _, similarity, _, postings = lists[0]
+                coverage.update(dict.fromkeys(postings, similarity))
+            else:
+                # Credit each document once per query term, at its closest match
+                best_similarity = {}
+                for _, similarity, _, postings in lists:
+                    for doc in postings:
+                        if similarity > best_similarity.get(doc, 0.0):
+                            best_similarity[doc] = similarity
+                coverage.update(best_similarity)
+
+        matches = [doc for doc, covered in coverage.items() if covered >= required]
+        # Highest score first; ties keep catalog order
+        top = heapq.nlargest(limit, matches, key=lambda doc: (scores[doc], -doc))
+        return len(matches), top
+
+    def _count_matches(self, expanded, required):
+        """Count matching documents from the sizes of intersections of the query terms' document sets"""
+        similarities = tuple(lists[0][1] if lists else 0.0 for lists in expanded)
+        doc_sets = [
+            lists[0][3].keys() if len(lists) == 1 else set().union(*(postings for _, _, _, postings in lists))
+            for lists in expanded
+        ]
+        intersections = {}
+
+        def intersection(mask):
+            members = intersections.get(mask)
+            if members is None:
+                terms = [i for i in range(len(doc_sets)) if mask >> i & 1]
+                if len(terms) == 1:
+                    members = doc_sets[terms[0]]
+                else:
+                    # Fold in one term at a time, reusing the intersection of the rest
+                    members = intersection(mask & ~(1 << terms[-1])) & doc_sets[terms[-1]]
+                intersections[mask] = members
+            return members
+
+        return sum(
+            coefficient * len(intersection(mask))
+            for mask, coefficient in _match_coefficients(similarities, required)
+        )
+
+    def _top_documents(self, index, expanded, required, limit):
+        """Return the best-ranked matching documents without scoring every posting
+
+        The impact-ordered lists are read in step. Each newly seen document
+        is scored in full, and the walk stops once the k-th best score is
+        above what any unseen document could still reach: the sum of the
+        next impact in every list.
+        """
+        walks = [
+            (weight,) + index.ranked(candidate)
+            for lists in expanded for candidate, _, weight, _ in lists
+        ]
+        top = []
+        seen = set()
+        depth = 0
+        while True:
+            threshold = 0.0
+            next_docs = []
+            for weight, docs, impacts in walks:
+                if depth < len(docs):
+                    threshold += weight * impacts[depth]
+                    next_docs.append(docs[depth])
+            if not next_docs:
+                break
+            if len(top) == limit:
+                worst_score, worst_doc = top[0][0], -top[0][1]
+                # Unseen documents scoring exactly the threshold come later in
+                # catalog order than the next document of every list
+                if worst_score > threshold or (worst_score == threshold and worst_doc < min(next_docs)):
+                    break
+
+            for doc in next_docs:
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                score = 0.0
+                covered = 0.0
+                for lists in expanded:
+                    contained = False
+                    for _, similarity, weight, postings in lists:
+                        impact = postings.get(doc)
+                        if impact is not None:
+                            score += weight * impact
+                            contained = True
+                    if contained:
+                        covered += similarity
+                if covered >= required:
+                    entry = (score, -doc)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+            depth += 1
+
+        return [-doc for _, doc in sorted(top, reverse=True)]
+
+
+@lru_cache(maxsize=256)
+def _match_coefficients(similarities, required):
+    """Return (term mask, coefficient) pairs whose intersection sizes sum to the match count
+
+    A document's coverage is the sum of the similarities of the query terms
+    it contains, so whether it matches depends only on that set of terms.
+    The number of documents containing exactly the terms in mask M is, by
+    inclusion-exclusion, the sum over supersets S of M of (-1)^(|S|-|M|)
+    times the size of the intersection of S's document sets; summing that
+    over every matching M gives one coefficient per S.
+    """
+    count = len(similarities)
+    matching = []
+    for mask in range(1, 1 << count):
+        covered = 0.0
+        for i in range(count):
+            if mask >> i & 1:
+                covered += similarities[i]
+        if covered >= required:
+            matching.append(mask)
+
+    coefficients = Counter()
+    for subset in matching:
+        superset = subset
+        rest = ~subset & ((1 << count) - 1)
+        # Walk every superset of subset by adding subsets of the other terms
+        extra = rest
+        while True:
+            superset = subset | extra
+            sign = -1 if bin(extra).count("1") % 2 else 1
+            coefficients[superset] += sign
+            if extra == 0:
+                break
+            extra = (extra - 1) & rest
+    return tuple((mask, coefficient) for mask, coefficient in coefficients.items() if coefficient)
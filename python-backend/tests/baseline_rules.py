@@ -0,0 +1,119 @@
+"""The original intent rules, kept verbatim from before they were compiled
+
+The compiled matchers must agree with these on every query.
+"""
+import random
+
+import app as backend
+
+
+def baseline_detect_intent(text):
+    text_lower = text.lower()
+
+    matched_intents = []
+    for intent_name, intent_data in backend.intents.items():
+        for pattern in intent_data.get("patterns", []):
+            if pattern in text_lower:
+                matched_intents.append((intent_name, text_lower.find(pattern)))
+
+    if matched_intents:
+        matched_intents.sort(key=lambda x: x[1])
+        return matched_intents[0][0]
+
+    for pattern in backend.section_inquiry_patterns:
+        if pattern in text_lower:
+            for section in backend.website_structure.keys():
+                if section in text_lower or any(
+                    alias in text_lower for alias in backend.website_structure[section]["aliases"]
+                ):
+                    return "section_inquiry"
+
+    for category in backend.product_categories:
+        if category in text_lower:
+            return "find_product"
+
+    return "unknown"
+
+
+def baseline_extract_entities(text, intent):
+    text_lower = text.lower().rstrip('.,!?;:')
+    intents = backend.intents
+
+    if intent == "find_product":
+        for pattern in intents[intent]["patterns"]:
+            if pattern in text_lower:
+                return {"product_query": text_lower.split(pattern)[1].strip()}
+        for category in backend.product_categories:
+            if category in text_lower:
+                return {"product_query": category}
+
+    elif intent == "add_to_cart":
+        for pattern in intents[intent]["patterns"]:
+            if pattern in text_lower:
+                return {"product_name": text_lower.split(pattern)[1].strip()}
+        if "add" in text_lower and not any(p in text_lower for p in intents[intent]["patterns"]):
+            return {"product_name": text_lower.split("add")[1].strip()}
+
+    elif intent == "navigation":
+        for pattern in intents[intent]["patterns"]:
+            if pattern in text_lower:
+                return {"destination": text_lower.split(pattern)[1].strip()}
+        for key, value in backend.direct_destinations.items():
+            if key in text_lower:
+                return {"destination": value}
+
+    elif intent == "product_info":
+        for pattern in intents[intent]["patterns"]:
+            if pattern in text_lower:
+                return {"product_name": text_lower.split(pattern)[1].strip()}
+
+    elif intent == "section_inquiry":
+        for section, data in backend.website_structure.items():
+            if section in text_lower:
+                return {"section": section}
+            for alias in data["aliases"]:
+                if alias in text_lower:
+                    return {"section": section}
+        for section, patterns in backend.section_patterns.items():
+            for pattern in patterns:
+                if pattern in text_lower:
+                    return {"section": section}
+
+    return {}
+
+
+def vocabulary():
+    """Every phrase the rules look for, plus filler"""
+    phrases = [pattern for data in backend.intents.values() for pattern in data.get("patterns", [])]
+    phrases += list(backend.section_inquiry_patterns)
+    for section, data in backend.website_structure.items():
+        phrases += [section] + list(data["aliases"])
+    phrases += list(backend.product_categories)
+    phrases += list(backend.direct_destinations)
+    phrases += [pattern for patterns in backend.section_patterns.values() for pattern in patterns]
+    phrases += ["add", "red", "wireless", "headphones", "cheap", "the", "a", "please", "shoes", "laptop"]
+    return phrases
+
+
+def fuzzed_queries(count, seed=7):
+    rng = random.Random(seed)
+    phrases = vocabulary()
+    queries = []
+    for _ in range(count):
+        words = [rng.choice(phrases) for _ in range(rng.randint(1, 5))]
+        # Glue some phrases together so patterns also meet mid-word
+        query = "".join(word + rng.choice([" ", " ", " ", ""]) for word in words).strip()
+        if rng.random() < 0.3:
+            query = query.upper() if rng.random() < 0.5 else query.capitalize()
+        if rng.random() < 0.3:
+            query += rng.choice(".,!?;:") * rng.randint(1, 2)
+        queries.append(query)
+    return queries
+
+
+# A fuzzed corpus plus a few everyday queries
+QUERIES = fuzzed_queries(3000) + [
+    "", "hello", "show me wireless headphones", "add the blue shirt to my cart", "go to my cart",
+    "do you have a wishlist?", "where is my order history", "tell me about the smart watch!",
+    "I need some kitchen stuff", "thanks, bye", "what's in my cart",
+]
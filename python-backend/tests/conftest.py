@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def backend():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
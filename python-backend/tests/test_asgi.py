@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+
+import asgi
+
+
+def call(method, path, chunks=(), app=None):
+    """Send one request through the ASGI app; return (status, headers, body)"""
+    app = app or asgi.AssistantASGI()
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)] or [{"type": "http.request", "body": b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await app({"type": "http", "method": method, "path": path}, receive, send)
+        if app.executor is not None:
+            app.executor.shutdown(wait=True)
+
+    asyncio.run(run())
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def post_json(path, payload, **kwargs):
+    status, headers, body = call("POST", path, [json.dumps(payload).encode()], **kwargs)
+    return status, json.loads(body) if body else None
+
+
+def metric(name):
+    """Read one sample from /api/metrics, 0 when absent"""
+    _, _, body = call("GET", "/api/metrics")
+    for line in body.decode().splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[-1])
+    return 0
+
+
+def test_assistant_answers_and_records_metrics(backend):
+    sample = 'assistant_requests_total{endpoint="assistant",status="ok"}'
+    before = metric(sample)
+
+    status, body = post_json("/api/assistant", {"query": "show me headphones", "user_id": "asgi"})
+    assert status == 200
+    assert body["type"] == "product_results"
+    assert backend.user_contexts.get("asgi").last_intent == "find_product"
+
+    status, headers, _ = call("GET", "/api/metrics")
+    assert status == 200 and headers[b"content-type"].startswith(b"text/plain")
+    assert metric(sample) == before + 1
+
+
+def test_assistant_rejects_bad_and_oversized_bodies(monkeypatch):
+    status, body = post_json("/api/assistant", {"query": 5})
+    assert status == 400 and "'query'" in body["error"]
+
+    # The same limit as the Flask app
+    assert asgi.MAX_BODY_BYTES == asgi.backend.MAX_REQUEST_BYTES
+    monkeypatch.setattr(asgi, "MAX_BODY_BYTES", 10)
+    status, _, body = call("POST", "/api/assistant", [b'{"query": ', b'"show me headphones"}'])
+    assert status == 413
+
+
+def test_assistant_sheds_load_when_the_pool_is_full(monkeypatch):
+    monkeypatch.setattr(asgi, "MAX_PENDING", 0)
+    status, headers, _ = call("POST", "/api/assistant", [b'{"query": "hello"}'])
+    assert status == 503 and headers[b"retry-after"] == b"1"
+
+
+def test_pool_processes_return_their_counts(backend, monkeypatch):
+    monkeypatch.setattr(asgi, "USE_PROCESSES", True)
+    for counter in asgi.POOL_COUNTERS:
+        counter.merge(counter.drain())
+    response, timings, counts = asgi.run_query("show me headphones", "pool", None, [], True)
+    assert response["type"] == "product_results"
+    assert "total_ms" in timings
+    intents, responses = counts
+    assert intents[("find_product",)] >= 1 and responses[("product_results",)] >= 1
+    # Drained, so the serving process does not count them twice
+    assert backend.intents_counter.drain() == {}
+
+
+def test_stream_answers_each_line(monkeypatch):
+    lines = [
+        {"transcript": "show me", "user_id": "streamer"},
+        {"transcript": "show me wireless headphones"},
+        {"transcript": "show me wireless headphones", "final": True},
+    ]
+    body = b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+    # Split mid-line, as a chunked upload would
+    status, headers, raw = call("POST", "/api/assistant/stream", [body[:20], body[20:50], body[50:]])
+    assert status == 200 and headers[b"content-type"] == b"application/x-ndjson"
+    events = [json.loads(line) for line in raw.splitlines()]
+    assert [event["event"] for event in events] == ["provisional", "final"]
+    assert events[-1]["response"]["type"] == "product_results"
+
+
+def test_stream_reports_bad_lines():
+    status, _, raw = call("POST", "/api/assistant/stream", [b'{"transcript": 5}\n'])
+    assert status == 200
+    assert json.loads(raw)["event"] == "error"
+
+
+def test_catalog_sync_and_conflict(backend, monkeypatch):
+    monkeypatch.setattr(backend, "catalog", backend.catalog)
+    status, _, body = call("GET", "/api/catalog")
+    version = json.loads(body)["version"]
+
+    status, body = post_json("/api/catalog/sync", {
+        "base_version": version, "upsert": [{"id": "asgi-1", "name": "Quokka Lamp", "price": 3.0}]})
+    assert status == 200 and body["previous_version"] == version
+    assert backend.current_catalog().get("asgi-1") is not None
+
+    status, body = post_json("/api/catalog/sync", {"base_version": version, "delete": ["asgi-1"]})
+    assert status == 409 and body["version"] != version
+
+    status, body = post_json("/api/catalog/sync", {"upsert": [{"id": "asgi-2", "name": "Lamp"}]})
+    assert status == 400 and "name and a price" in body["error"]
+
+
+def test_unknown_routes_and_preflight():
+    assert call("GET", "/api/nope")[0] == 404
+    assert call("OPTIONS", "/api/assistant")[0] == 204
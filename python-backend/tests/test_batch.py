@@ -0,0 +1,42 @@
+def test_batch_answers_every_item_in_order(client, backend):
+    response = client.post('/api/assistant/batch', json={
+        'user_id': 'batcher',
+        'items': [{'query': 'hello'}, {'query': 'show me headphones'}, {'query': 'add it to my cart', 'user_id': 'x'}],
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 3
+    assert [result['index'] for result in body['results']] == [0, 1, 2]
+    assert body['results'][1]['type'] == 'product_results'
+    assert body['catalog_version'] == backend.current_catalog().version
+    assert backend.user_contexts.get('batcher').last_intent == 'find_product'
+
+
+def test_batch_reports_why_an_item_was_rejected(client):
+    response = client.post('/api/assistant/batch', json={
+        'items': [{'query': 'hello'}, {'query': 5}, 'not an object'],
+    })
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert 'error' not in results[0]
+    assert results[1] == {'error': "'query' must be of type str", 'index': 1}
+    assert results[2] == {'error': 'Expected a JSON object', 'index': 2}
+
+
+def test_batch_rejects_bad_batches(client, backend, monkeypatch):
+    assert client.post('/api/assistant/batch', json={'items': []}).status_code == 400
+    assert client.post('/api/assistant/batch', data=b'{', content_type='application/json').status_code == 400
+
+    monkeypatch.setattr(backend, 'MAX_BATCH_SIZE', 2)
+    response = client.post('/api/assistant/batch', json={'items': [{'query': 'hi'}] * 3})
+    assert response.status_code == 400
+    assert 'limited to 2' in response.get_json()['error']
+
+
+def test_batch_uses_posted_products(client):
+    response = client.post('/api/assistant/batch', json={
+        'products': [{'id': 'p1', 'name': 'Zebra Lamp', 'price': 12.0, 'category': 'home'}],
+        'items': [{'query': 'show me zebra lamp'}],
+    })
+    result = response.get_json()['results'][0]
+    assert [product['id'] for product in result['products']] == ['p1']
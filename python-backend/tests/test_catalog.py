@@ -0,0 +1,191 @@
+import random
+
+import pytest
+
+from catalog import Catalog
+from catalog_journal import CatalogConflict, CatalogJournal
+
+ADJECTIVES = ["red", "blue", "wireless", "smart", "leather", "steel", "organic", "compact", "classic", "sport"]
+NOUNS = ["headphones", "watch", "shirt", "shoes", "kettle", "lamp", "backpack", "speaker", "mug", "jacket"]
+CATEGORIES = ["electronics", "clothing", "kitchen", "accessories", "footwear", "home"]
+
+QUERIES = ["red shoes", "wireless headphones", "smart watch", "steel kettle", "blue", "lamp",
+           "leathr jackt", "sport speaker mug", "organic classic compact", "headphone", "xyz"]
+
+
+def random_product(rng, product_id):
+    return {
+        "id": product_id,
+        "name": f"{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+        "description": " ".join(rng.choice(ADJECTIVES + NOUNS) for _ in range(rng.randint(0, 6))),
+        "category": rng.choice(CATEGORIES),
+        "price": round(rng.uniform(1, 500), 2),
+        "discount": rng.choice([0, 0, 10, 25]),
+    }
+
+
+def random_delta(rng, catalog, next_id):
+    ids = [product.id for product in catalog.products]
+    upserts, deletes = [], []
+    for _ in range(rng.randint(0, 8)):
+        roll = rng.random()
+        if roll < 0.4 or not ids:
+            upserts.append(random_product(rng, next_id()))
+        elif roll < 0.6:
+            upserts.append({"id": rng.choice(ids), "price": round(rng.uniform(1, 500), 2)})
+        elif roll < 0.8:
+            changes = random_product(rng, rng.choice(ids))
+            upserts.append({k: changes[k] for k in ("id", rng.choice(["name", "category", "description"]))})
+        else:
+            deletes.append(rng.choice(ids))
+    return upserts, deletes
+
+
+def describe(catalog):
+    """Everything a request can read from a catalog, in comparable form"""
+    return {
+        "products": [product.to_dict() for product in catalog.products],
+        "size": len(catalog),
+        "categories": {c: [p.id for p in catalog.in_category(c)] for c in CATEGORIES},
+        "search": {q: (lambda r: (r[0], [p.id for p in r[1]]))(catalog.search(q, 5)) for q in QUERIES},
+        "best_match": {q: getattr(catalog.best_match(q), "id", None) for q in QUERIES},
+    }
+
+
+@pytest.fixture
+def base_products():
+    rng = random.Random(1)
+    return [random_product(rng, i) for i in range(300)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_apply_matches_a_fresh_catalog(base_products, seed):
+    rng = random.Random(seed)
+    counter = iter(range(1000, 100000))
+    catalog = Catalog(base_products)
+    catalog.search_index
+    for _ in range(40):
+        catalog = catalog.apply(*random_delta(rng, catalog, lambda: next(counter)))
+        ids = [product.id for product in catalog.products]
+        for product_id in rng.sample(ids, min(5, len(ids))):
+            assert catalog.get(product_id).id == product_id
+    assert describe(catalog) == describe(Catalog(catalog.products))
+
+
+def test_apply_compacts_after_many_deletes(base_products, monkeypatch):
+    monkeypatch.setattr("catalog.COMPACT_MIN_DELETED", 16)
+    catalog = Catalog(base_products[:40])
+    catalog.search_index
+    updated = catalog.apply([{"id": 5, "name": "blue steel lamp"}], list(range(10, 35)))
+    assert updated.deleted == 0 and len(updated.docs) == 15
+    assert describe(updated) == describe(Catalog(updated.products))
+
+
+def test_apply_leaves_the_parent_snapshot_untouched(base_products):
+    catalog = Catalog(base_products)
+    catalog.search_index
+    before = describe(catalog)
+    version = catalog.version
+
+    updated = catalog.apply(
+        [{"id": 0, "name": "brand new kettle", "category": "kitchen"}, {"id": 1, "price": 1.0},
+         {"id": "new", "name": "red wireless lamp", "price": 9.5, "category": "home"}],
+        [2, 3],
+    )
+
+    assert describe(catalog) == before
+    assert catalog.version == version
+    assert updated.version != version
+    assert updated.get(2) is None and catalog.get(2) is not None
+    assert updated.get("new") is not None and catalog.get("new") is None
+
+
+def test_apply_versions_depend_on_parent_and_delta(base_products):
+    catalog = Catalog(base_products)
+    delta = ([{"id": 5, "price": 3.0}], [7])
+    assert catalog.apply(*delta).version == catalog.apply(*delta).version
+    assert catalog.apply(*delta).version != catalog.apply([{"id": 5, "price": 4.0}], [7]).version
+
+
+def test_apply_rejects_incomplete_new_products(base_products):
+    with pytest.raises(ValueError, match="name and a price"):
+        Catalog(base_products).apply([{"id": "new", "name": "lamp"}])
+
+
+def test_journal_carries_syncs_between_catalogs(tmp_path, base_products):
+    path = str(tmp_path / "journal.db")
+    first, second = CatalogJournal(path), CatalogJournal(path)
+    start = Catalog(base_products)
+
+    current, updated = first.append(start, [{"id": 1, "price": 2.0}], [3], start.version)
+    assert current is start
+    caught_up = second.catch_up(Catalog(base_products))
+    assert caught_up.version == updated.version
+    assert describe(caught_up) == describe(updated)
+
+    # A stale base version conflicts, naming the journal's latest snapshot
+    with pytest.raises(CatalogConflict) as conflict:
+        second.append(Catalog(base_products), [{"id": 4, "price": 1.0}], [], start.version)
+    assert conflict.value.catalog.version == updated.version
+
+    # Without a base version the delta lands on top of the latest
+    _, latest = second.append(Catalog(base_products), [{"id": 4, "price": 1.0}], [])
+    assert first.catch_up(updated).version == latest.version
+    assert first.stats()["deltas"] == 2
+
+
+def test_journal_records_nothing_for_a_rejected_delta(tmp_path, base_products):
+    journal = CatalogJournal(str(tmp_path / "journal.db"))
+    with pytest.raises(ValueError):
+        journal.append(Catalog(base_products), [{"id": "new"}], [])
+    assert journal.stats()["deltas"] == 0
+
+
+def test_journal_restores_a_far_behind_worker_from_the_newest_checkpoint(tmp_path, base_products, monkeypatch):
+    path = str(tmp_path / "journal.db")
+    writer = CatalogJournal(path, checkpoint_interval=10)
+    rng = random.Random(7)
+    counter = iter(range(1000, 100000))
+    latest = Catalog(base_products)
+    for _ in range(25):
+        _, latest = writer.append(latest, *random_delta(rng, latest, lambda: next(counter)))
+    assert writer.stats()["checkpoints"] == 1
+
+    applied = []
+    original_apply = Catalog.apply
+    monkeypatch.setattr(Catalog, "apply", lambda self, *delta: applied.append(1) or original_apply(self, *delta))
+
+    # A worker starting from the catalog file replays only the deltas after the checkpoint
+    restarted = CatalogJournal(path, checkpoint_interval=10).catch_up(Catalog(base_products))
+    assert len(applied) == 5
+    assert restarted.version == latest.version
+    assert describe(restarted) == describe(latest)
+
+    # One just behind the checkpoint keeps applying deltas instead of reloading
+    applied.clear()
+    assert writer.catch_up(latest).version == latest.version
+    assert applied == []
+
+
+def test_sync_endpoint_answers_conflicts_and_bad_bodies(client, backend, monkeypatch):
+    # Leave the server catalog as the other tests expect it
+    monkeypatch.setattr(backend, "catalog", backend.catalog)
+    version = backend.current_catalog().version
+    product_id = backend.current_catalog().products[0].id
+
+    response = client.post("/api/catalog/sync", json={"upsert": [{"id": product_id, "price": 1.5}],
+                                                      "base_version": version})
+    assert response.status_code == 200
+    assert response.get_json()["previous_version"] == version
+    assert backend.current_catalog().get(product_id).price == 1.5
+
+    stale = client.post("/api/catalog/sync", json={"delete": [product_id], "base_version": version})
+    assert stale.status_code == 409
+    assert stale.get_json()["version"] == response.get_json()["version"]
+
+    assert client.post("/api/catalog/sync", data=b"{not json").status_code == 400
+    assert client.post("/api/catalog/sync", json={"upsert": [{"id": "new", "name": "lamp"}]}).status_code == 400
+    assert client.post("/api/catalog/sync", json={"delete": [True]}).status_code == 400
+
+    monkeypatch.setattr(backend, "MAX_REQUEST_BYTES", 64)
+    assert client.post("/api/catalog/sync", json={"delete": list(range(100))}).status_code == 413
@@ -0,0 +1,58 @@
+import pytest
+
+import codec
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"{", "not valid JSON"),
+    (b"[]", "JSON object"),
+    (b'{"query": 5}', "'query'"),
+    (b'{"products": [{"name": "lamp", "price": 1}]}', "must have an 'id'"),
+    (b'{"products": [{"id": 1, "price": 1}]}', "missing 'name'"),
+    (b'{"products": [{"id": 1, "name": "lamp", "price": "1"}]}', "'price' must be a number"),
+    (b'{"products": [{"id": 1, "name": "lamp", "price": true}]}', "'price' must be a number"),
+    (b'{"cart": [{"id": 1, "price": 1, "quantity": 0}]}', "Invalid cart item"),
+])
+def test_assistant_request_rejections(body, message):
+    with pytest.raises(codec.RequestError, match=message):
+        codec.decode_request(body)
+
+
+def test_assistant_request_defaults():
+    request = codec.decode_request(b'{"query": "hi", "products": []}')
+    assert (request.query, request.user_id, request.cart, request.products) == ("hi", "anonymous", [], None)
+
+
+@pytest.mark.parametrize("body, message", [
+    (b'{"upsert": [{"name": "lamp"}]}', "must have an 'id'"),
+    (b'{"upsert": [{"id": 1, "stock": 1.5}]}', "'stock' must be"),
+    (b'{"delete": [true]}', "deleted id"),
+    (b'{"delete": [{"id": 1}]}', "deleted id"),
+    (b'{"base_version": 3}', "'base_version'"),
+])
+def test_catalog_delta_rejections(body, message):
+    with pytest.raises(codec.RequestError, match=message):
+        codec.decode_catalog_delta(body)
+
+
+def test_catalog_delta_accepts_partial_upserts():
+    delta = codec.decode_catalog_delta(b'{"upsert": [{"id": "a", "price": 2}], "delete": [1, "b"]}')
+    assert (delta.upserts, delta.deletes, delta.base_version) == ([{"id": "a", "price": 2}], [1, "b"], None)
+
+
+def test_round_trips_and_compacts_responses():
+    response = {"type": "product_results", "products": [{"id": 1, "name": "Lamp", "price": 2.5, "description": "long"}]}
+    encoded = codec.encode_response(response)
+    assert codec.loads(encoded)["products"] == [codec.compact_product(response["products"][0])]
+    assert "description" not in codec.loads(encoded)["products"][0]
+
+
+def test_flask_routes_answer_400_and_413(client, backend, monkeypatch):
+    response = client.post('/api/assistant', json={'products': [{'id': 1, 'name': 'Lamp', 'price': 'cheap'}]})
+    assert response.status_code == 400
+    assert "'price' must be a number" in response.get_json()['error']
+
+    monkeypatch.setattr(backend, 'MAX_REQUEST_BYTES', 16)
+    response = client.post('/api/assistant', json={'query': 'show me wireless headphones'})
+    assert response.status_code == 413
+    assert response.get_json()['error'] == 'Request body exceeds 16 bytes'
@@ -0,0 +1,182 @@
+import fnmatch
+import socketserver
+import threading
+
+import pytest
+
+from context_store import (
+    ContextStoreError,
+    MemoryContextStore,
+    RedisConnection,
+    RedisContextStore,
+    SQLiteContextStore,
+    create_context_store,
+)
+from models import UserContext
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Answers the RESP commands the context store sends from an in-memory dict"""
+
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        assert header.startswith(b"*")
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, bytes):
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+        elif isinstance(value, list):
+            self.wfile.write(b"*%d\r\n" % len(value))
+            for item in value:
+                self.reply(item)
+        else:
+            self.wfile.write(value.encode("utf-8") + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        authenticated = server.password is None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            server.commands.append([command] + args[1:])
+            if command == b"AUTH":
+                authenticated = args[1].decode() == server.password
+                self.reply("+OK" if authenticated else "-WRONGPASS invalid password")
+            elif not authenticated:
+                self.reply("-NOAUTH Authentication required")
+            elif command in (b"SELECT", b"SET"):
+                if command == b"SET":
+                    server.data[args[1]] = args[2]
+                self.reply("+OK")
+            elif command == b"GET":
+                self.reply(server.data.get(args[1]))
+            elif command == b"DEL":
+                self.reply(1 if server.data.pop(args[1], None) is not None else 0)
+            elif command == b"DBSIZE":
+                self.reply(len(server.data))
+            elif command == b"INFO":
+                self.reply(b"# Stats\r\nevicted_keys:2\r\nexpired_keys:3\r\n")
+            elif command == b"KEYS":
+                self.reply(sorted(server.data))
+            elif command == b"SCAN":
+                # One key per page, so callers must follow the cursor
+                keys = sorted(key for key in server.data if fnmatch.fnmatchcase(key, args[3]))
+                cursor = int(args[1])
+                self.reply([b"0" if cursor + 1 >= len(keys) else str(cursor + 1).encode(), keys[cursor:cursor + 1]])
+            else:
+                self.reply(f"-ERR unknown command '{command.decode()}'")
+
+
+@pytest.fixture
+def fake_redis():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.data = {}
+    server.commands = []
+    server.password = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_connection_decodes_replies(fake_redis):
+    conn = RedisConnection("127.0.0.1", fake_redis.server_address[1])
+    assert conn.execute("SET", "key", "value") == "OK"
+    assert conn.execute("GET", "key") == b"value"
+    assert conn.execute("GET", "missing") is None
+    assert conn.execute("DBSIZE") == 1
+    assert conn.execute("KEYS", "*") == [b"key"]
+    with pytest.raises(ContextStoreError, match="unknown command"):
+        conn.execute("FLUSHALL")
+    conn.close()
+
+
+def test_redis_connection_authenticates_and_selects_db(fake_redis):
+    fake_redis.password = "secret"
+    conn = RedisConnection("127.0.0.1", fake_redis.server_address[1], db=2, password="secret")
+    conn.execute("DBSIZE")
+    assert fake_redis.commands[:2] == [[b"AUTH", b"secret"], [b"SELECT", b"2"]]
+
+    wrong = RedisConnection("127.0.0.1", fake_redis.server_address[1], password="wrong")
+    with pytest.raises(ContextStoreError, match="WRONGPASS"):
+        wrong.execute("DBSIZE")
+
+
+def test_redis_connection_reports_unreachable_server():
+    with socketserver.TCPServer(("127.0.0.1", 0), FakeRedisHandler) as server:
+        port = server.server_address[1]
+    with pytest.raises(ContextStoreError, match="failed"):
+        RedisConnection("127.0.0.1", port, timeout=0.5).execute("DBSIZE")
+
+
+def test_redis_store_round_trips_contexts(fake_redis):
+    store = create_context_store(f"redis://127.0.0.1:{fake_redis.server_address[1]}/0", ttl=60)
+    assert isinstance(store, RedisContextStore)
+    assert store.get("alice") is None
+
+    store.set("alice", UserContext([1, 2], "find_product", "positive"))
+    context = store.get("alice")
+    assert context.last_product_ids == [1, 2]
+    assert context.last_intent == "find_product"
+    assert context.sentiment == "positive"
+    assert [b"SET", b"assistant:context:alice"] == fake_redis.commands[-2][:2]
+    assert fake_redis.commands[-2][-2:] == [b"EX", b"60"]
+
+    # Keys outside the store's prefix are not counted
+    fake_redis.data[b"other:key"] = b"1"
+    store.set("bob", UserContext())
+    stats = store.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (2, 1, 1)
+    assert (stats["evictions"], stats["expirations"]) == (2, 3)
+
+    store.delete("alice")
+    assert store.get("alice") is None
+
+
+def test_redis_store_stats_survive_an_unreachable_server():
+    with socketserver.TCPServer(("127.0.0.1", 0), FakeRedisHandler) as server:
+        port = server.server_address[1]
+    store = create_context_store(f"redis://127.0.0.1:{port}/0")
+    stats = store.stats()
+    assert stats["backend"] == "redis" and stats["size"] is None
+
+
+def test_sqlite_store_is_shared_across_threads(tmp_path):
+    store = create_context_store(f"sqlite:///{tmp_path / 'contexts.db'}")
+    assert isinstance(store, SQLiteContextStore)
+    store.set("alice", UserContext([7], "add_to_cart"))
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(store.get("alice")))
+    thread.start()
+    thread.join()
+    assert seen[0].last_product_ids == [7]
+    assert len(store) == 1
+
+
+def test_sqlite_store_requires_a_file_path():
+    with pytest.raises(ValueError, match="memory://"):
+        create_context_store("sqlite://")
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryContextStore(max_size=2, ttl=0)
+    for user_id in ("a", "b", "c"):
+        store.set(user_id, UserContext())
+    assert store.get("a") is None
+    assert len(store) == 2
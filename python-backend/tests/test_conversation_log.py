@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from conversation_log import ConversationLog, create_conversation_log, read_events
+
+
+def events_in(log, backups):
+    """Every event still on disk, oldest first"""
+    names = [log._rotated_name(number) for number in range(backups, 0, -1)] + [log.current_path]
+    return [event for name in names if os.path.exists(name) for event in read_events(name)]
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_rotation_keeps_the_newest_events_in_order(tmp_path, compress):
+    log = ConversationLog(str(tmp_path / "log-{worker}.jsonl"), max_bytes=200, backups=3,
+                          compress=compress, batch_size=1)
+    log.set_worker(2)
+    for i in range(100):
+        log.record({"query": f"query {i}", "intent": "greeting"})
+    log.close()
+
+    assert log.current_path == str(tmp_path / "log-2.jsonl")
+    assert log.rotations > 3
+    assert not os.path.exists(log._rotated_name(4))
+    kept = [event["query"] for event in events_in(log, 3)]
+    assert kept == [f"query {i}" for i in range(100 - len(kept), 100)]
+    assert log.stats() == {"path": log.current_path, "written": 100, "pending": 0, "dropped": 0,
+                           "rotations": log.rotations}
+
+
+def test_close_writes_everything_queued(tmp_path):
+    log = ConversationLog(str(tmp_path / "log.jsonl"), flush_interval=60)
+    for i in range(10):
+        log.record({"index": i})
+    log.close()
+    assert [event["index"] for event in read_events(log.current_path)] == list(range(10))
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = ConversationLog(str(tmp_path / "log.jsonl"), queue_size=1)
+    # Taken, so record() does not start a writer that would drain the queue
+    log._pid = os.getpid()
+    log.record({"index": 0})
+    log.record({"index": 1})
+    assert log.stats()["dropped"] == 1
+
+
+def test_logging_is_off_without_a_path(monkeypatch):
+    monkeypatch.delenv("CONVERSATION_LOG_PATH", raising=False)
+    assert create_conversation_log() is None
+
+
+def test_history_records_each_answered_turn(backend, monkeypatch):
+    monkeypatch.setattr(backend, "CONTEXT_HISTORY", True)
+    backend.handle_query("hello", "history-test", backend.current_catalog(), [])
+    backend.handle_query("go to my orders", "history-test", backend.current_catalog(), [])
+    history = list(backend.load_user_context("history-test").history)
+    assert [intent for intent, _ in history] == ["greeting", "navigation"]
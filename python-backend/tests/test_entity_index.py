@@ -0,0 +1,21 @@
+import app as backend
+from baseline_rules import QUERIES, baseline_detect_intent, baseline_extract_entities
+
+ENTITY_INTENTS = ["find_product", "add_to_cart", "navigation", "product_info", "section_inquiry", "greeting"]
+
+
+def test_extract_entities_matches_baseline():
+    mismatches = []
+    for query in QUERIES:
+        for intent in [baseline_detect_intent(query)] + ENTITY_INTENTS:
+            expected = baseline_extract_entities(query, intent)
+            if backend.extract_entities(query, intent) != expected:
+                mismatches.append((query, intent, backend.extract_entities(query, intent), expected))
+    assert not mismatches[:5]
+
+
+def test_resolves_navigation_destinations_to_sections():
+    index = backend.entity_index
+    assert index.resolve_section("my orders") == "orders"
+    assert index.find_category("anything for the kitchen?") == "kitchen"
+    assert index.find_category("nothing here") is None
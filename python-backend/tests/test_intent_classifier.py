@@ -0,0 +1,34 @@
+import pytest
+
+import intent_classifier
+
+pytestmark = pytest.mark.skipif(intent_classifier.np is None, reason="NumPy is not installed")
+
+EXAMPLES = [
+    ("hello there", "greeting"), ("hi", "greeting"), ("good morning", "greeting"),
+    ("show me shoes", "find_product"), ("find a lamp", "find_product"), ("show me lamps", "find_product"),
+    ("thanks a lot", "thanks"), ("thank you", "thanks"),
+]
+
+
+def test_saved_model_maps_back_on_a_cache_line_boundary(tmp_path):
+    model = intent_classifier.IntentClassifier.train(EXAMPLES, n_features=256, epochs=100)
+    path = str(tmp_path / "model.bin")
+    model.save(path)
+
+    loaded = intent_classifier.IntentClassifier.load(path)
+    assert loaded.weights.offset % intent_classifier.ALIGNMENT == 0
+    assert loaded.labels == model.labels
+    assert [label for label, _ in loaded.predict_batch(["hello", "show me a lamp", "thank you"])] == \
+        ["greeting", "find_product", "thanks"]
+
+
+def test_engine_falls_back_to_the_rules_when_unsure(tmp_path, backend):
+    model = intent_classifier.IntentClassifier.train(EXAMPLES, n_features=256, epochs=100)
+    engine = intent_classifier.ClassifierEngine(model, backend.intent_matcher, threshold=1.01)
+    assert engine.detect_batch(["go to my cart"]) == [backend.intent_matcher.detect("go to my cart")]
+
+
+def test_load_engine_falls_back_for_a_missing_model(tmp_path, backend):
+    engine = intent_classifier.load_engine(backend.intent_matcher, str(tmp_path / "missing.bin"))
+    assert engine is backend.intent_matcher
@@ -0,0 +1,41 @@
+import random
+
+import app as backend
+from baseline_rules import QUERIES, baseline_detect_intent
+from intent_matcher import AhoCorasick
+
+
+def test_automaton_finds_every_occurrence():
+    rng = random.Random(5)
+    patterns = ["he", "she", "his", "hers", "h", "ushers", "is"]
+    automaton = AhoCorasick({pattern: pattern.upper() for pattern in patterns})
+    for _ in range(300):
+        text = "".join(rng.choice("hersiu ") for _ in range(rng.randint(0, 30)))
+        expected = sorted(
+            (start, pattern, pattern.upper())
+            for pattern in patterns
+            for start in range(len(text))
+            if text.startswith(pattern, start)
+        )
+        assert sorted(automaton.iter_matches(text)) == expected
+
+
+def test_automaton_advance_matches_a_single_scan():
+    automaton = AhoCorasick({"show me": 1, "me": 2, "cart": 3})
+    text = "show me my cart"
+    state, matches = 0, []
+    for start in range(0, len(text), 2):
+        state, found = automaton.advance(text[start:start + 2], state, start)
+        matches += found
+    assert matches == list(automaton.iter_matches(text))
+
+
+def test_detect_intent_matches_baseline():
+    mismatches = [(q, backend.detect_intent(q), baseline_detect_intent(q))
+                  for q in QUERIES if backend.detect_intent(q) != baseline_detect_intent(q)]
+    assert not mismatches[:5]
+
+
+def test_detect_batch_matches_detect():
+    texts = [query.lower() for query in QUERIES[:500]]
+    assert backend.intent_matcher.detect_batch(texts) == [backend.intent_matcher.detect(t) for t in texts]
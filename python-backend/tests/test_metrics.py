@@ -0,0 +1,52 @@
+import metrics
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.gauge("queue_size", "Queued", lambda: 3)
+    registry.gauge("unknown_size", "Not readable now", lambda: None)
+
+    requests.inc("ok")
+    requests.inc("ok", amount=2)
+    latency.observe(0.05)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{status="ok"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert 'queue_size 3' in lines
+    assert not any(line.startswith("unknown_size ") for line in lines)
+
+
+def test_counter_drain_and_merge():
+    source = metrics.Counter("a", "A", ("kind",))
+    target = metrics.Counter("a", "A", ("kind",))
+    source.inc("x")
+    target.inc("x")
+    target.merge(source.drain())
+    assert source.drain() == {}
+    assert list(target.samples()) == [("a", '{kind="x"}', 2)]
+
+
+def test_metrics_endpoint_counts_requests_and_stages(client, backend, monkeypatch):
+    monkeypatch.setattr(backend, "METRICS_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(backend, "response_cache", None)
+    client.post('/api/assistant', json={'query': 'show me headphones'})
+    client.post('/api/assistant', json={'query': 5})
+
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'assistant_requests_total{endpoint="assistant",status="ok"}' in text
+    assert 'assistant_requests_total{endpoint="assistant",status="invalid"}' in text
+    assert 'assistant_intents_total{intent="find_product"}' in text
+    for stage in ("parse", "intent", "entities", "response", "serialize"):
+        assert f'assistant_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'assistant_catalog_products ' in text
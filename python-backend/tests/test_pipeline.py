@@ -0,0 +1,47 @@
+import time
+
+from pipeline import Pipeline
+
+
+def build(calls):
+    pipeline = Pipeline()
+
+    @pipeline.stage("slow")
+    def slow(run):
+        calls.append("slow")
+        time.sleep(0.02)
+        return run["query"].upper()
+
+    @pipeline.stage("wrapped")
+    def wrapped(run):
+        calls.append("wrapped")
+        return run["slow"] + "!"
+
+    @pipeline.stage("unused")
+    def unused(run):
+        calls.append("unused")
+
+    return pipeline
+
+
+def test_stages_run_once_and_only_on_demand():
+    calls = []
+    run = build(calls).run(query="hi")
+    assert run["wrapped"] == "HI!"
+    assert run["wrapped"] == "HI!"
+    assert calls == ["wrapped", "slow"]
+    assert "unused" not in run and set(run.timings) == {"wrapped", "slow"}
+
+
+def test_stage_times_exclude_the_stages_they_pull_in():
+    run = build([]).run(query="hi")
+    run["wrapped"]
+    assert run.timings["slow"] >= 20
+    assert run.timings["wrapped"] < 10
+
+
+def test_seeded_values_skip_their_stage():
+    calls = []
+    run = build(calls).run(query="hi", slow="SEEDED")
+    assert run["wrapped"] == "SEEDED!"
+    assert calls == ["wrapped"]
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+import pricing
+from models import CartItem
+
+needs_numpy = pytest.mark.skipif(pricing.np is None, reason="NumPy is not installed")
+
+
+def random_cart(rng, lines):
+    return [
+        CartItem(i, round(rng.uniform(0.5, 300), 2), rng.randint(1, 5), f"item {i}", rng.choice([0, 0, 5, 12.5, 50]))
+        for i in range(lines)
+    ]
+
+
+def close(vectorized, looped):
+    a, b = vectorized.to_dict(), looped.to_dict()
+    assert a == pytest.approx(b, abs=0.011)
+    assert (vectorized.item_count, vectorized.line_count) == (looped.item_count, looped.line_count)
+    assert vectorized.total == pytest.approx(looped.total, rel=1e-9, abs=1e-9)
+
+
+@needs_numpy
+@pytest.mark.parametrize("lines", [pricing.VECTOR_MIN_LINES, 500, 5000])
+def test_numpy_cart_matches_loop(lines):
+    cart = random_cart(random.Random(lines), lines)
+    close(pricing.summarize_cart(cart), pricing._summarize_loop(cart))
+
+
+@needs_numpy
+def test_numpy_carts_match_loop():
+    rng = random.Random(11)
+    carts = [random_cart(rng, rng.randint(0, 40)) for _ in range(200)]
+    for vectorized, cart in zip(pricing.summarize_carts(carts), carts):
+        close(vectorized, pricing._summarize_loop(cart))
+
+
+def test_free_shipping_threshold():
+    summary = pricing.summarize_cart([CartItem(1, 60.0, 1, discount=50)])
+    assert summary.to_dict()["total"] == 30.0
+    assert not summary.free_shipping
+    assert summary.to_dict()["amount_to_free_shipping"] == 20.0
+
+
+@pytest.mark.parametrize("item, message", [
+    ({"id": 1, "price": True}, "'price' must be a number"),
+    ({"id": 1, "price": "3"}, "'price' must be a number"),
+    ({"id": 1, "price": -1}, "'price' must be from 0"),
+    ({"id": 1, "price": 1e308}, "'price' must be from 0"),
+    ({"id": 1, "price": 3, "quantity": 2.7}, "'quantity' must be an integer"),
+    ({"id": 1, "price": 3, "quantity": -2}, "'quantity' must be from 1"),
+    ({"id": 1, "price": 3, "quantity": 0}, "'quantity' must be from 1"),
+    ({"id": 1, "price": 3, "quantity": False}, "'quantity' must be an integer"),
+    ({"id": 1, "price": 3, "discount": 150}, "'discount' must be a percentage"),
+    ({"id": 1}, "missing 'price'"),
+    ("item", "must be a JSON object"),
+])
+def test_cart_summary_rejects_bad_items(client, item, message):
+    response = client.post('/api/cart/summary', json={'cart': [item]})
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+
+
+def test_cart_summary_prices_one_cart(client):
+    response = client.post('/api/cart/summary', json={'cart': [
+        {'id': 1, 'price': 30.0, 'quantity': 2, 'discount': 10},
+        {'id': 2, 'price': 5, 'discount': None},
+    ]})
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'item_count': 3, 'line_count': 2, 'subtotal': 65.0, 'savings': 6.0, 'total': 59.0,
+        'free_shipping': True, 'amount_to_free_shipping': 0.0,
+    }
+
+
+def test_cart_summary_quotes_several_carts(client, backend, monkeypatch):
+    response = client.post('/api/cart/summary', json={'carts': [[{'price': 10}], [], [{'price': 60}]]})
+    body = response.get_json()
+    assert body['count'] == 3
+    assert [summary['total'] for summary in body['summaries']] == [10.0, 0.0, 60.0]
+
+    monkeypatch.setattr(backend, 'MAX_BATCH_SIZE', 2)
+    assert client.post('/api/cart/summary', json={'carts': [[], [], []]}).status_code == 400
+    assert client.post('/api/cart/summary', json={'carts': [{}]}).status_code == 400
@@ -0,0 +1,64 @@
+import gzip
+
+import pytest
+
+import benchmark
+import codec
+import replay
+from conversation_log import read_events
+
+LOG = (b'{"query": "hello", "user_id": "a"}\n'
+       b'{"query": "b\n'
+       b'\n'
+       b'[1]\n'
+       b'{"query": ""}\n'
+       b'{"query": 5, "user_id": "b"}\n'
+       b'{"query": "go to my orders", "user_id": "b", "cart": [{"id": 1, "price": 2.5}]}\n'
+       b'{"query": "show me lamps", "cart": [{"id": 1}]}\n')
+
+
+@pytest.fixture
+def log_files(tmp_path):
+    plain = tmp_path / "log.jsonl"
+    plain.write_bytes(LOG)
+    compressed = tmp_path / "log.jsonl.1.gz"
+    with gzip.open(compressed, "wb") as f:
+        f.write(b'{"query": "thank you"}\n')
+    return [str(plain), str(compressed)]
+
+
+def test_read_events_skips_malformed_lines_only_when_asked(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_bytes(b'{"query": "a"}\n{"query": "b\n\n[1]\n{"query": "c"}\n')
+    with pytest.raises(codec.RequestError):
+        list(read_events(str(path)))
+
+    skipped = []
+    events = list(read_events(str(path), lambda path, number, error: skipped.append(number)))
+    assert [event["query"] for event in events] == ["a", "c"]
+    assert skipped == [2, 4]
+
+
+def test_read_requests_counts_what_it_skips(log_files):
+    requests, skipped = replay.read_requests(log_files)
+    assert [request.query for request in requests] == ["hello", "go to my orders", "thank you"]
+    assert [request.user_id for request in requests] == ["a", "b", "anonymous"]
+    # The torn line, the array, the empty query, the bad query type and the bad cart
+    assert skipped == 5
+
+
+def test_replayed_traffic_keeps_queries_and_users(log_files):
+    traffic, skipped = benchmark.replayed_traffic(log_files, 10)
+    assert traffic == [("hello", "a"), ("go to my orders", "b"), ("show me lamps", "anonymous"),
+                       ("thank you", "anonymous")]
+    assert skipped == 4
+    assert benchmark.replayed_traffic(log_files, 2) == ([("hello", "a"), ("go to my orders", "b")], 4)
+
+
+def test_replay_runs_requests_in_order(log_files):
+    requests, _ = replay.read_requests(log_files)
+    results, profile = replay.run(requests)
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["intent"] for result in results] == ["greeting", "navigation", "thanks"]
+    assert profile is None
+    assert replay.summarize(results)["overall"]["count"] == 3
@@ -0,0 +1,54 @@
+import pytest
+
+from ttl_cache import TTLCache
+
+
+@pytest.fixture
+def cache(backend, monkeypatch):
+    cache = TTLCache(100, 60)
+    monkeypatch.setattr(backend, "response_cache", cache)
+    return cache
+
+
+def test_repeated_query_is_answered_from_the_cache(backend, cache):
+    catalog = backend.current_catalog()
+    first_timings, second_timings = {}, {}
+    first = backend.handle_query("Show me headphones", "cache-a", catalog, [], first_timings)
+    second = backend.handle_query("show me headphones ", "cache-b", catalog, [], second_timings)
+
+    assert "intent_ms" in first_timings and set(second_timings) == {"cache_ms", "total_ms"}
+    assert [p.id for p in second["products"]] == [p.id for p in first["products"]]
+    assert cache.stats()["hits"] == 1
+    # A hit still updates the user's context as a full run would
+    context = backend.user_contexts.get("cache-b")
+    assert context.last_intent == "find_product"
+    assert context.last_product_ids == [p.id for p in first["products"]]
+
+
+def test_varying_responses_are_rebuilt_on_a_hit(backend, cache):
+    catalog = backend.current_catalog()
+    backend.handle_query("hello", "cache-c", catalog, [])
+    intent, entities, cached_response = cache.get(("hello", catalog.version))
+    assert intent == "greeting" and cached_response is None
+    assert backend.handle_query("hello", "cache-c", catalog, [])["type"] == "greeting"
+    # One hit from the lookup above, one from the repeated query
+    assert cache.stats()["hits"] == 2
+
+
+def test_cache_is_keyed_by_catalog_version_and_cleared_on_reload(backend, cache):
+    catalog = backend.current_catalog()
+    backend.handle_query("show me headphones", "cache-d", catalog, [])
+    updated = catalog.apply([{"id": "cache-1", "name": "Headphones Deluxe", "price": 10}])
+    timings = {}
+    backend.handle_query("show me headphones", "cache-d", updated, [], timings)
+    assert "cache_ms" not in timings
+
+    backend.reload_matchers()
+    assert len(cache) == 0
+
+
+def test_flask_route_answers_from_the_cache(client, cache):
+    for _ in range(2):
+        response = client.post('/api/assistant', json={'query': 'show me headphones'})
+        assert response.status_code == 200
+    assert cache.stats()["hits"] == 1
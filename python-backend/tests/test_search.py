@@ -0,0 +1,62 @@
+import random
+
+import search
+from catalog import Catalog
+
+ADJECTIVES = ["red", "blue", "wireless", "smart", "leather", "steel", "organic", "compact", "classic", "sport"]
+NOUNS = ["headphones", "watch", "shirt", "shoes", "kettle", "lamp", "backpack", "speaker", "mug", "jacket"]
+
+
+def products(count, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+            "description": " ".join(rng.choice(ADJECTIVES + NOUNS) for _ in range(rng.randint(0, 6))),
+            "category": "misc",
+            "price": 1.0,
+        }
+        for i in range(count)
+    ]
+
+
+def test_ranks_closer_matches_first():
+    catalog = Catalog([
+        {"id": 1, "name": "Steel Kettle", "price": 30, "category": "kitchen"},
+        {"id": 2, "name": "Wireless Headphones", "price": 90, "category": "electronics",
+         "description": "Over-ear wireless headphones with noise cancelling"},
+        {"id": 3, "name": "Headphone Stand", "price": 15, "category": "accessories"},
+    ])
+    total, found = catalog.search("wireless headphones")
+    assert found[0].id == 2
+    assert total == len(found)
+
+
+def test_tolerates_misspellings_and_prefixes():
+    catalog = Catalog([
+        {"id": 1, "name": "Leather Jacket", "price": 99, "category": "clothing"},
+        {"id": 2, "name": "Steel Kettle", "price": 30, "category": "kitchen"},
+    ])
+    assert [product.id for product in catalog.search("leathr jacket")[1]] == [1]
+    assert catalog.search("jack")[0] == 1
+    assert catalog.search("xyz")[0] == 0
+
+
+def test_fast_path_matches_exhaustive_scoring(monkeypatch):
+    rng = random.Random(3)
+    index = Catalog(products(5000, 3)).search_index
+    queries = ["red shoes", "wireless headphones", "smart watch", "leathr jackt", "headphone", "xyz"] + [
+        " ".join(rng.choice(ADJECTIVES + NOUNS) for _ in range(rng.randint(1, 6))) for _ in range(150)
+    ]
+
+    def run():
+        return [index.search(query, limit, view, coverage)
+                for query in queries
+                for limit in (1, 3, 20)
+                for view, coverage in (("all", 0.5), ("all", 1.0), ("name", 0.6))]
+
+    monkeypatch.setattr(search, "EXHAUSTIVE_MAX_POSTINGS", 0)
+    fast = run()
+    monkeypatch.setattr(search, "EXHAUSTIVE_MAX_POSTINGS", float("inf"))
+    assert fast == run()
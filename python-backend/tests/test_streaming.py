@@ -0,0 +1,71 @@
+import json
+
+import app as backend
+from baseline_rules import QUERIES
+
+
+def test_intent_stream_matches_detect_on_every_prefix():
+    for query in QUERIES[:500]:
+        text_lower = query.lower()
+        stream = backend.intent_matcher.stream()
+        for end in range(0, len(text_lower) + 1, 3):
+            assert stream.update(text_lower[:end]) == backend.intent_matcher.detect(text_lower[:end])
+        assert stream.update(text_lower) == backend.intent_matcher.detect(text_lower)
+
+
+def test_entity_stream_matches_extract_on_every_prefix():
+    for query in QUERIES[:500]:
+        text_lower = query.lower()
+        stream = backend.entity_index.stream()
+        for end in list(range(0, len(text_lower), 4)) + [len(text_lower)]:
+            prefix = text_lower[:end]
+            stream.update(prefix)
+            intent = backend.intent_matcher.detect(prefix)
+            assert stream.extract(intent) == backend.entity_index.extract(prefix, intent), prefix
+
+
+def test_streams_restart_when_the_transcript_is_revised():
+    intents = backend.intent_matcher.stream()
+    entities = backend.entity_index.stream()
+    for text in ["show me red", "add the red shoes", "go to my cart"]:
+        intents.update(text)
+        entities.update(text)
+    assert intents.intent == "navigation"
+    assert entities.extract("navigation") == backend.entity_index.extract("go to my cart", "navigation")
+
+
+def post_stream(client, lines):
+    body = b"".join(line if isinstance(line, bytes) else json.dumps(line).encode() + b"\n" for line in lines)
+    response = client.post("/api/assistant/stream", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    assert response.content_type == "application/x-ndjson"
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+def test_stream_sends_provisional_events_then_the_final_answer(client):
+    events = post_stream(client, [
+        {"transcript": "go to", "user_id": "stream-test"},
+        {"transcript": "go to my"},
+        {"transcript": "go to my orders", "final": True},
+        {"transcript": "ignored after the final line"},
+    ])
+
+    assert [event["event"] for event in events] == ["provisional", "final"]
+    assert events[0]["intent"] == "navigation"
+    assert "action" not in events[0]["response"]
+    assert events[-1]["transcript"] == "go to my orders"
+    expected = backend.handle_query("go to my orders", "stream-test-reference", backend.current_catalog(), [])
+    assert events[-1]["response"]["type"] == expected["type"]
+    assert events[-1]["response"]["message"] == expected["message"]
+
+
+def test_stream_without_a_final_line_answers_the_last_transcript(client):
+    events = post_stream(client, [{"transcript": "hello"}, {"transcript": "hello there"}])
+    assert events[-1]["event"] == "final"
+    assert events[-1]["transcript"] == "hello there"
+
+
+def test_stream_reports_a_bad_line(client):
+    events = post_stream(client, [{"transcript": "go to my cart"}, b'{"transcript": 5}\n'])
+    assert events[-1]["event"] == "error"
+    assert "transcript" in events[-1]["error"]
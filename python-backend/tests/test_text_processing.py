@@ -0,0 +1,12 @@
+import text_processing
+
+
+def test_normalize_text_strips_punctuation_and_spacing():
+    assert text_processing.normalize_text("  Show ME   the shoes!?  ") == "show me the shoes"
+
+
+def test_lemmas_are_memoized():
+    text_processing.lemmatize.cache_clear()
+    assert text_processing.lemmatize("shoes") == text_processing.lemmatize("shoes")
+    stats = text_processing.cache_stats()["lemma"]
+    assert (stats["size"], stats["hits"], stats["misses"]) == (1, 1, 1)
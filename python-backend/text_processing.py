@@ -0,0 +1,42 @@
+"""Cached text processing shared by the assistant pipeline.
+
+Product queries and catalog text repeat the same vocabulary, so lemmas are
+memoized per token. The cache size comes from LEMMA_CACHE_SIZE.
+"""
+import os
+import string
+from functools import lru_cache
+
+import nlp_resources
+
+LEMMA_CACHE_SIZE = int(os.environ.get("LEMMA_CACHE_SIZE", 50000))
+
+# Punctuation-stripping table, built once
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+
+def normalize_text(text):
+    """Lower-case text, strip punctuation and collapse whitespace"""
+    return " ".join(text.lower().translate(PUNCTUATION_TABLE).split())
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(token):
+    """Return the WordNet lemma of a token"""
+    return nlp_resources.get_lemmatizer().lemmatize(token)
+
+
+def cache_stats():
+    """Return size and hit rate of the lemma cache"""
+    stats = {}
+    for name, cached in (("lemma", lemmatize),):
+        info = cached.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+    return stats
@@ -0,0 +1,89 @@
+"""Size-bounded LRU cache with per-entry time-to-live."""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ttl seconds after being set"""
+
+    def __init__(self, max_size, ttl=None, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key and mark it most recently used"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries if full"""
+        with self._lock:
+            now = self._clock()
+            expires_at = now + self.ttl if self.ttl else None
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            # Expired entries are dropped from the cold end before counting evictions
+            while self._data:
+                oldest_key, (oldest_expiry, _) = next(iter(self._data.items()))
+                if oldest_expiry is None or oldest_expiry > now or oldest_key == key:
+                    break
+                del self._data[oldest_key]
+                self.expirations += 1
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove key and return its value"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Return hit, miss, eviction and expiration counts"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }